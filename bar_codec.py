@@ -0,0 +1,92 @@
+import json
+import struct
+
+import pandas as pd
+
+from config import bar_encoding
+
+# Binary bars start with their version byte; JSON bars start with '{', so both can share a key
+BAR_CODEC_VERSION = 2
+
+# v2: version, seq (per-series bar number), ts_event (close, ns), open, high, low, close, volume,
+# ts_recv, ts_local, ts_close, ts_publish (ns), then symbol and timeframe as length-prefixed UTF-8
+_BAR_V2 = struct.Struct('<BQq4dq4q')
+# v1: as v2 without seq; still decoded (seq 0) for bars written before sequence numbers
+_BAR_V1 = struct.Struct('<Bq4dq4q')
+_LAYOUTS = {1: _BAR_V1, 2: _BAR_V2}
+_TIMING_FIELDS = ('ts_recv', 'ts_local', 'ts_close', 'ts_publish')
+OHLCV = ('open', 'high', 'low', 'close', 'volume')
+
+
+def _pack_str(value):
+    data = value.encode('utf-8')
+    return bytes((len(data),)) + data
+
+
+def encode_bar(bar, encoding=bar_encoding):
+    """
+    Serialize a bar dict (symbol, timeframe, seq, int ns timestamp, OHLCV and optional ts_* timings).
+    'binary' gives the fixed-layout record of BAR_CODEC_VERSION; 'json' gives the original JSON object with an
+    ISO timestamp, for consumers that have not been upgraded.
+    """
+    if encoding == 'json':
+        payload = dict(bar)
+        payload['ts_event'] = bar['timestamp']
+        payload['timestamp'] = pd.Timestamp(bar['timestamp']).isoformat()
+        return json.dumps(payload)
+    return _BAR_V2.pack(
+        BAR_CODEC_VERSION, bar.get('seq', 0), bar['timestamp'],
+        bar['open'], bar['high'], bar['low'], bar['close'], bar['volume'],
+        *(bar.get(field, 0) for field in _TIMING_FIELDS)
+    ) + _pack_str(bar.get('symbol', '')) + _pack_str(bar.get('timeframe', ''))
+
+
+def decode_bar(data):
+    """Inverse of encode_bar for either format; 'timestamp' and 'ts_event' come back as int ns."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    version = data[0]
+    if version == ord('{'):
+        bar = json.loads(data)
+        bar['timestamp'] = pd.Timestamp(bar['timestamp']).value
+        bar.setdefault('ts_event', bar['timestamp'])
+        bar.setdefault('seq', 0)
+        return bar
+    layout = _LAYOUTS.get(version)
+    if layout is None:
+        raise ValueError(f"Unsupported bar encoding version {version}")
+
+    values = layout.unpack_from(data)
+    if version == 1:
+        values = values[:1] + (0,) + values[1:]
+    bar = dict(zip(OHLCV, values[3:8]))
+    bar['seq'] = values[1]
+    bar['timestamp'] = bar['ts_event'] = values[2]
+    bar.update(zip(_TIMING_FIELDS, values[8:]))
+    offset = layout.size
+    symbol_len = data[offset]
+    bar['symbol'] = data[offset + 1:offset + 1 + symbol_len].decode('utf-8')
+    offset += 1 + symbol_len
+    bar['timeframe'] = data[offset + 1:offset + 1 + data[offset]].decode('utf-8')
+    return bar
+
+
+def decode_bar_columns(members):
+    """Decode ZSET members (oldest first) into {'seq': [...], 'timestamp': [ns...], 'open': [...], ...} columns."""
+    columns = {name: [] for name in ('seq', 'timestamp') + OHLCV}
+    unpack_v2 = _BAR_V2.unpack_from
+    for member in members:
+        if member[0] == BAR_CODEC_VERSION:
+            # Fast path: only the fixed part is needed
+            values = unpack_v2(member)
+            columns['seq'].append(values[1])
+            columns['timestamp'].append(values[2])
+            for name, value in zip(OHLCV, values[3:8]):
+                columns[name].append(value)
+        else:
+            bar = decode_bar(member)
+            columns['seq'].append(bar['seq'])
+            columns['timestamp'].append(bar['timestamp'])
+            for name in OHLCV:
+                columns[name].append(bar[name])
+    return columns
@@ -0,0 +1,73 @@
+import numpy as np
+
+
+class BarRingBuffer:
+    """
+    Fixed-capacity, preallocated OHLCV history.
+
+    Every bar is written twice, at slot i and i + capacity, so the most recent N bars
+    always sit in one contiguous slice and last(n) can hand out NumPy views instead of
+    copies. Views stay valid until the next append; take them under the owner's lock.
+    """
+
+    COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("BarRingBuffer capacity must be at least 1")
+        self.capacity = capacity
+        self.timestamp = np.zeros(2 * capacity, dtype=np.int64)  # ns since epoch
+        self.open = np.zeros(2 * capacity, dtype=np.float64)
+        self.high = np.zeros(2 * capacity, dtype=np.float64)
+        self.low = np.zeros(2 * capacity, dtype=np.float64)
+        self.close = np.zeros(2 * capacity, dtype=np.float64)
+        self.volume = np.zeros(2 * capacity, dtype=np.int64)
+        self.total = 0  # bars ever appended
+        self._pos = 0  # next slot to write, in [0, capacity)
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp, open, high, low, close, volume):
+        i = self._pos
+        j = i + self.capacity
+        self.timestamp[i] = self.timestamp[j] = timestamp
+        self.open[i] = self.open[j] = open
+        self.high[i] = self.high[j] = high
+        self.low[i] = self.low[j] = low
+        self.close[i] = self.close[j] = close
+        self.volume[i] = self.volume[j] = volume
+        self._pos = (i + 1) % self.capacity
+        self.total += 1
+
+    def extend(self, timestamp, open, high, low, close, volume):
+        """Bulk append column arrays (oldest first); only the last `capacity` rows are kept."""
+        n = len(timestamp)
+        if n == 0:
+            return
+        keep = min(n, self.capacity)
+        columns = (timestamp, open, high, low, close, volume)
+        slots = (self._pos + np.arange(n - keep, n)) % self.capacity
+        for name, values in zip(self.COLUMNS, columns):
+            target = getattr(self, name)
+            tail = np.asarray(values)[n - keep:]
+            target[slots] = tail
+            target[slots + self.capacity] = tail
+        self._pos = (self._pos + n) % self.capacity
+        self.total += n
+
+    def last(self, n):
+        """Return {column: view} for the most recent n bars (fewer if not enough stored), oldest first."""
+        n = min(n, len(self))
+        end = self._pos + self.capacity
+        return {name: getattr(self, name)[end - n:end] for name in self.COLUMNS}
+
+    def last_timestamp(self):
+        """Timestamp (ns) of the most recent bar, or None if empty."""
+        if not self.total:
+            return None
+        return int(self.timestamp[self._pos + self.capacity - 1])
+
+    def clear(self):
+        self.total = 0
+        self._pos = 0
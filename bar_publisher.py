@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+
+import redis.asyncio as aioredis
+
+from config import redis_publisher_connections
+
+
+class AsyncBarPublisher:
+    """
+    Sends completed bars to Redis from the producer's event loop on pooled asyncio connections.
+
+    The aggregator thread hands each bar over with submit() and never waits on the network.
+    Every bar series (symbol:timeframe) gets its own queue and worker task, so bars of one
+    series are written in order while a slow round trip for one series does not hold up
+    the others; at most redis_publisher_connections pipelines are in flight at once.
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.loop = None
+        self.queues = {}  # series -> asyncio.Queue of (queue_commands, on_published, bar_data)
+        self.workers = {}
+        self.published = 0
+        self.failed = 0
+        self.logger = logging.getLogger('AsyncBarPublisher')
+
+    @classmethod
+    def connect(cls, host='localhost', port=6379, db=0, max_connections=redis_publisher_connections):
+        pool = aioredis.ConnectionPool(host=host, port=port, db=db, max_connections=max_connections)
+        return cls(aioredis.Redis(connection_pool=pool))
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+
+    def submit(self, series, queue_commands, on_published, bar_data):
+        """
+        Thread-safe hand-off of one bar. queue_commands(pipe) queues the bar's commands on a
+        MULTI/EXEC pipeline; on_published(bar_data, published_ns) runs once it is executed.
+        """
+        self.loop.call_soon_threadsafe(self._enqueue, series, (queue_commands, on_published, bar_data))
+
+    def _enqueue(self, series, item):
+        queue = self.queues.get(series)
+        if queue is None:
+            queue = self.queues[series] = asyncio.Queue()
+            self.workers[series] = self.loop.create_task(self._worker(series, queue))
+        queue.put_nowait(item)
+
+    async def _worker(self, series, queue):
+        while True:
+            queue_commands, on_published, bar_data = await queue.get()
+            try:
+                pipe = self.redis_client.pipeline(transaction=True)
+                queue_commands(pipe)
+                await pipe.execute()
+                self.published += 1
+                on_published(bar_data, time.time_ns())
+            except Exception as e:
+                self.failed += 1
+                self.logger.error(f"Failed to publish bar for {series}: {e}")
+            finally:
+                queue.task_done()
+
+    def stats(self):
+        return {
+            'published': self.published,
+            'failed': self.failed,
+            'pending': sum(queue.qsize() for queue in self.queues.values()),
+        }
+
+    async def close(self, timeout=10):
+        """Flush the queued bars (up to timeout seconds), then stop the workers and the pool"""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self.queues.values())), timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Gave up flushing bars after {timeout}s: {self.stats()}")
+        for task in self.workers.values():
+            task.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        await self.redis_client.aclose()
@@ -0,0 +1,206 @@
+import logging
+import time
+
+import redis
+
+from config import (bar_stream_batch_size, bar_stream_block_ms, bar_stream_consumer, bar_stream_group,
+                    bar_stream_maxlen, bar_transport)
+from shm_ring import ShmRingReader, ShmRingWriter, ShmWakeupClient, ShmWakeupServer
+
+
+class PubSubTransport:
+    """Fire-and-forget bar delivery on tick_bars:{series} channels; bars sent while no one listens are lost."""
+
+    name = 'pubsub'
+    in_pipeline = True
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.pubsub = None
+
+    def publish(self, pipe, series, message):
+        """Queue the bar on the producer's MULTI/EXEC pipeline"""
+        pipe.publish(f"tick_bars:{series}", message)
+
+    def subscribe(self, series):
+        self.pubsub = self.redis_client.pubsub()
+        for name in series:
+            self.pubsub.subscribe(f"tick_bars:{name}")
+
+    def listen(self):
+        """Yield batches of (series, message bytes); one message per batch for pub/sub"""
+        for message in self.pubsub.listen():
+            if message['type'] == 'message':
+                yield [(message['channel'].decode('utf-8').split(':', 1)[1], message['data'])]
+
+    def close(self):
+        if self.pubsub is not None:
+            self.pubsub.close()
+
+
+class StreamTransport:
+    """
+    Bars on Redis Streams (bar_stream:{series}), read through a consumer group.
+
+    XADD trims each stream to about bar_stream_maxlen entries. The consumer first re-reads
+    its own pending (delivered but unacknowledged) entries, then new ones, up to
+    bar_stream_batch_size per XREADGROUP call, and acknowledges a batch once the caller has
+    handled it. A restarted consumer therefore catches up on everything it missed in one
+    read, and no bar is dropped between delivery and handling.
+    """
+
+    name = 'streams'
+    in_pipeline = True
+
+    def __init__(self, redis_client, group=bar_stream_group, consumer=bar_stream_consumer, maxlen=bar_stream_maxlen,
+                 batch_size=bar_stream_batch_size, block_ms=bar_stream_block_ms):
+        self.redis_client = redis_client
+        self.group = group
+        self.consumer = consumer
+        self.maxlen = maxlen
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.streams = {}  # stream key -> next id to read: '0' (own pending entries) then '>' (new)
+        self.logger = logging.getLogger('StreamTransport')
+
+    @staticmethod
+    def stream_key(series):
+        return f"bar_stream:{series}"
+
+    def publish(self, pipe, series, message):
+        """Queue the bar on the producer's MULTI/EXEC pipeline"""
+        pipe.xadd(self.stream_key(series), {'bar': message}, maxlen=self.maxlen, approximate=True)
+
+    def subscribe(self, series):
+        for name in series:
+            key = self.stream_key(name)
+            try:
+                # '$': a new group starts with the next bar, not the whole retained stream
+                self.redis_client.xgroup_create(key, self.group, id='$', mkstream=True)
+                self.logger.info(f"Created consumer group {self.group} on {key}")
+            except redis.exceptions.ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+            self.streams[key] = '0'
+
+    def listen(self):
+        """Yield batches of (series, message bytes), acknowledging each batch when the caller asks for the next"""
+        while True:
+            response = self.redis_client.xreadgroup(
+                self.group, self.consumer, self.streams, count=self.batch_size, block=self.block_ms
+            )
+            for key, entries in response or []:
+                key = key.decode('utf-8') if isinstance(key, bytes) else key
+                if not entries:
+                    if self.streams[key] == '0':
+                        self.streams[key] = '>'  # pending entries drained, switch to new ones
+                    continue
+                series = key.split(':', 1)[1]
+                # Pending entries already trimmed by MAXLEN come back without fields; they are just acked
+                batch = [(series, fields[b'bar']) for _, fields in entries if fields]
+                if batch:
+                    yield batch
+                self.redis_client.xack(key, self.group, *[entry_id for entry_id, _ in entries])
+
+    def close(self):
+        pass
+
+
+class SharedMemoryTransport:
+    """
+    Same-host bar delivery through a shared memory ring per series (see shm_ring.py), bypassing Redis.
+
+    The producer writes each bar to its series' ring as soon as it closes, without waiting for
+    the Redis pipeline (which still stores the bar in the ZSET and the resume point), and wakes
+    the readers through their eventfds. The consumer scans its rings on every wakeup, and every
+    block_ms it attaches rings that did not exist yet and re-attaches rings replaced by a
+    restarted producer. Bars it misses are caught by its sequence check and read from the ZSET.
+    """
+
+    name = 'shm'
+    in_pipeline = False
+
+    def __init__(self, redis_client, block_ms=bar_stream_block_ms):
+        self.redis_client = redis_client
+        self.block_ms = block_ms
+        self.writers = {}  # series -> ShmRingWriter (producer)
+        self.wakeup = None
+        self.series = []
+        self.readers = {}  # series -> ShmRingReader (consumer), missing until the producer creates the ring
+        self.client = None
+        self.logger = logging.getLogger('SharedMemoryTransport')
+
+    def publish(self, pipe, series, message):
+        """Write the bar to the ring right away; pipe is unused (None)"""
+        writer = self.writers.get(series)
+        if writer is None:
+            if self.wakeup is None:
+                self.wakeup = ShmWakeupServer()
+            writer = self.writers[series] = ShmRingWriter(series)
+            self.logger.info(f"Created bar ring {writer.name} for {series}")
+        writer.write(message)
+        self.wakeup.notify()
+
+    def subscribe(self, series):
+        self.series = list(series)
+        self.client = ShmWakeupClient()
+        self._refresh_rings()
+
+    def _refresh_rings(self):
+        for name in self.series:
+            reader = self.readers.get(name)
+            if reader is not None and not reader.is_stale():
+                continue
+            if reader is not None:
+                reader.close()
+                del self.readers[name]
+            try:
+                # A replacement ring only holds bars written since the producer restarted: read them all
+                self.readers[name] = ShmRingReader(name, from_start=reader is not None)
+                self.logger.info(f"Attached bar ring for {name}")
+            except FileNotFoundError:
+                pass
+
+    def listen(self):
+        """Yield batches of (series, message bytes): everything written to the rings since the last batch"""
+        next_refresh = time.monotonic() + self.block_ms / 1000
+        while True:
+            batch = []
+            for name, reader in list(self.readers.items()):
+                overruns = reader.overruns
+                batch.extend((name, message) for message in reader.read())
+                if reader.overruns != overruns:
+                    self.logger.warning(f"Overran {reader.overruns - overruns} bars on the {name} ring")
+            if batch:
+                yield batch
+            elif time.monotonic() >= next_refresh:
+                self._refresh_rings()
+                next_refresh = time.monotonic() + self.block_ms / 1000
+            else:
+                # A bar written after the scan above has already bumped the eventfd, so none is missed
+                self.client.wait(max(next_refresh - time.monotonic(), 0))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        if self.wakeup is not None:
+            self.wakeup.close()
+        for reader in self.readers.values():
+            reader.close()
+        if self.client is not None:
+            self.client.disconnect()
+
+
+BAR_TRANSPORTS = {
+    PubSubTransport.name: PubSubTransport,
+    StreamTransport.name: StreamTransport,
+    SharedMemoryTransport.name: SharedMemoryTransport,
+}
+
+
+def make_bar_transport(redis_client, kind=bar_transport):
+    """Build the bar transport selected by config.bar_transport ('pubsub', 'streams' or 'shm')"""
+    try:
+        return BAR_TRANSPORTS[kind](redis_client)
+    except KeyError:
+        raise ValueError(f"Unknown bar transport '{kind}', expected one of {list(BAR_TRANSPORTS)}")
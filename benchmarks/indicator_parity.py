@@ -0,0 +1,156 @@
+"""
+Parity check and timing of the streaming trend indicators (indicators.IndicatorEngine).
+
+Feeds a synthetic bar series one bar at a time through IndicatorEngine.sync the way the
+strategy consumer does (its rolling bar window, max period + 1 + padding bars), with every bar
+first synced once with a provisional close and then revised to its final close, as happens to
+a still-forming last bar of historical_data. At every bar the engine's crossover signal is
+compared with two references, both pandas_ta.ema / pandas_ta.sma / utils.wilders_smoothing:
+
+  full    run over the whole series up to that bar. The engine must match it exactly; any
+          mismatch here is a bug and makes the script exit non-zero.
+  window  run over only the last max(period1, period2) + 1 bars, which is what
+          StrategyConsumer.get_tick_dataframe hands the tick strategies today. EMA and Wilder
+          values over such a short window differ from the full-history values, so this column
+          counts the signals that would change by turning on config.streaming_indicators.
+
+    python -m benchmarks.indicator_parity --bars 5000
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+
+from config import tick_bar_history_padding
+from indicators import IndicatorEngine
+from utils import wilders_smoothing
+
+KINDS = ("EMA", "SMA", "WilderSmoother")
+
+
+def synthetic_closes(count, seed=11):
+    """Random walk on a 0.25 tick grid, flat stretches included, so exact ties between trends occur"""
+    rng = random.Random(seed)
+    price = 5000.0
+    closes = []
+    for _ in range(count):
+        price += rng.choice((-0.5, -0.25, 0, 0, 0.25, 0.5))
+        closes.append(price)
+    return closes
+
+
+def reference_trend(df, kind, length):
+    """The DataFrame computation StrategyConsumer.strategy and main_equities.strategy run"""
+    if kind == "EMA":
+        return ta.ema(df["close"], length=length)
+    if kind == "SMA":
+        return ta.sma(df["close"], length=length)
+    return wilders_smoothing(df, length=length)
+
+
+def crossover(trend1, trend2):
+    """'LONG', 'SHORT' or None from (previous, last) values of both trends, as the strategies decide"""
+    if np.isnan(trend1).any() or np.isnan(trend2).any():
+        return None
+    if trend1[1] > trend2[1] and trend1[0] < trend2[0]:
+        return "LONG"
+    if trend1[1] < trend2[1] and trend1[0] > trend2[0]:
+        return "SHORT"
+    return None
+
+
+def windowed_signal(closes, i, spec1, spec2):
+    """The tick strategies' signal at bar i: trends over only the last max period + 1 bars"""
+    n_bars = max(spec1[1], spec2[1]) + 1
+    if i + 1 < n_bars:
+        return None  # get_tick_dataframe has too few bars, the strategy skips the run
+    df = pd.DataFrame({"close": closes[i + 1 - n_bars:i + 1]})
+    trend1 = reference_trend(df, *spec1)
+    trend2 = reference_trend(df, *spec2)
+    if trend1 is None or trend2 is None:
+        return None
+    return crossover(trend1.to_numpy()[-2:], trend2.to_numpy()[-2:])
+
+
+def run_pair(closes, spec1, spec2, rng):
+    timestamps = np.arange(len(closes), dtype=np.int64) * 1_000_000_000
+    closes = np.asarray(closes)
+    df = pd.DataFrame({"close": closes})
+    ref1 = reference_trend(df, *spec1)
+    ref2 = reference_trend(df, *spec2)
+    ref1 = np.full(len(closes), np.nan) if ref1 is None else ref1.reindex(df.index).to_numpy()
+    ref2 = np.full(len(closes), np.nan) if ref2 is None else ref2.reindex(df.index).to_numpy()
+
+    window = max(spec1[1], spec2[1]) + 1 + tick_bar_history_padding
+    engine = IndicatorEngine()
+    mismatches = signals = window_mismatches = window_signals = 0
+    max_diff = 0.0
+    engine_time = 0.0
+    for i in range(1, len(closes)):
+        start = max(0, i + 1 - window)
+        provisional = closes[start:i + 1].copy()
+        provisional[-1] += rng.choice((-0.25, 0.25))
+        t0 = time.perf_counter()
+        engine.sync(timestamps[start:i + 1], provisional, (spec1, spec2))
+        values = engine.sync(timestamps[start:i + 1], closes[start:i + 1], (spec1, spec2))
+        engine_time += time.perf_counter() - t0
+
+        expected = crossover(ref1[i - 1:i + 1], ref2[i - 1:i + 1])
+        actual = crossover(np.array(values[spec1]), np.array(values[spec2]))
+        signals += expected is not None
+        mismatches += expected != actual
+        windowed = windowed_signal(closes, i, spec1, spec2)
+        window_signals += windowed is not None
+        window_mismatches += windowed != actual
+        if not np.isnan(ref1[i]):
+            max_diff = max(max_diff, abs(values[spec1][1] - ref1[i]), abs(values[spec2][1] - ref2[i]))
+    return mismatches, signals, window_mismatches, window_signals, max_diff, engine_time / (2 * (len(closes) - 1))
+
+
+def time_dataframe(closes, spec1, spec2, runs=200):
+    """Per-run cost of the DataFrame recompute over the consumer window"""
+    window = max(spec1[1], spec2[1]) + 1
+    df = pd.DataFrame({"close": closes[-window:]})
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        frame = df.copy()
+        frame["trend1"] = reference_trend(frame, *spec1)
+        frame["trend2"] = reference_trend(frame, *spec2)
+    return (time.perf_counter() - t0) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=3000)
+    parser.add_argument("--periods", default="7,30", help="period1,period2")
+    args = parser.parse_args()
+    period1, period2 = (int(p) for p in args.periods.split(","))
+
+    closes = synthetic_closes(args.bars)
+    rng = random.Random(3)
+    failed = False
+    window_total = [0, 0]  # signals differing from the windowed reference, signals it gave
+    print(f"{'trend1':<20} {'trend2':<20} {'full sig':>8} {'mismatch':>8} {'win sig':>8} {'differ':>8} "
+          f"{'max diff':>10} {'stream/bar':>11} {'pandas/run':>11}")
+    for kind1, kind2 in itertools.product(KINDS, KINDS):
+        spec1, spec2 = (kind1, period1), (kind2, period2)
+        mismatches, signals, window_mismatches, window_signals, max_diff, per_bar = run_pair(closes, spec1, spec2, rng)
+        per_run = time_dataframe(closes, spec1, spec2)
+        failed |= mismatches > 0
+        window_total[0] += window_mismatches
+        window_total[1] += window_signals
+        print(f"{kind1 + ' ' + str(period1):<20} {kind2 + ' ' + str(period2):<20} {signals:>8,} {mismatches:>8,} "
+              f"{window_signals:>8,} {window_mismatches:>8,} {max_diff:>10.2e} {per_bar * 1e6:>9.1f}us "
+              f"{per_run * 1e6:>9.1f}us")
+    print(f"Signals that differ from the current windowed computation: {window_total[0]:,} "
+          f"(it gave {window_total[1]:,} signals)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
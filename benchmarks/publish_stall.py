@@ -0,0 +1,63 @@
+"""
+Do slow Redis round trips for one contract stall the bars of the others?
+
+Replays the same paced synthetic feed for several contracts twice: once publishing every bar
+synchronously from the aggregator thread, once through AsyncBarPublisher. The in-memory Redis
+stand-in gives every pipeline --rtt-ms of latency and the first contract's pipelines
+--slow-rtt-ms. The report compares the closing tick's reader-to-published latency of the
+slow contract against all the others.
+
+    python -m benchmarks.publish_stall --contracts 8 --rtt-ms 1 --slow-rtt-ms 20
+"""
+import argparse
+import os
+
+from bar_publisher import AsyncBarPublisher
+from benchmarks.replay_producer import (AsyncInMemoryRedis, InMemoryRedis, build_feeds, print_stages,
+                                        run_replay)
+from benchmarks.tick_hot_path import synthetic_records
+from latency import LatencyRecorder
+
+
+def run_mode(mode, records, args):
+    slow_key = "STALL-0:"
+    rtt = args.rtt_ms / 1000
+    slow_rtt = args.slow_rtt_ms / 1000
+    stats = LatencyRecorder(mode)
+    redis_client = InMemoryRedis(rtt=rtt, slow_keys=(slow_key,), slow_rtt=slow_rtt)
+    publisher = None
+    if mode == 'async':
+        publisher = AsyncBarPublisher(AsyncInMemoryRedis(rtt=rtt, slow_keys=(slow_key,), slow_rtt=slow_rtt))
+    feeds = build_feeds("STALL", [args.bar], args.contracts, redis_client, stats, max_period=30, quiet=True,
+                        stats_key=lambda ticker, timeframe: 'slow' if ticker == "STALL-0" else 'others')
+    result = run_replay(records, feeds, args.speed, publisher)
+    print(f"--- {mode} publish: {result['bars']:,} bars in {result['elapsed']:.2f}s, "
+          f"queue high water {result['queue']['high_water']:,}")
+    print_stages(stats)
+    return stats.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trades", type=int, default=20_000, help="synthetic trades per contract")
+    parser.add_argument("--contracts", type=int, default=8)
+    parser.add_argument("--bar", default="50t")
+    parser.add_argument("--speed", type=float, default=5, help="multiple of the synthetic feed's recorded rate")
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="round trip of every bar pipeline")
+    parser.add_argument("--slow-rtt-ms", type=float, default=20.0, help="round trip of the first contract's pipelines")
+    args = parser.parse_args()
+    if args.contracts < 2:
+        parser.error("need at least two contracts")
+
+    os.makedirs("logs", exist_ok=True)
+    records = synthetic_records(args.trades)
+    results = {mode: run_mode(mode, records, args) for mode in ('sync', 'async')}
+
+    print("--- p99 reader-to-published latency of the other contracts")
+    for mode, snapshot in results.items():
+        others = snapshot['others']['stages']['tick_to_published']
+        print(f"{mode:<6} p99={others['p99_us'] / 1000:>10,.1f}ms  max={others['max_us'] / 1000:>10,.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
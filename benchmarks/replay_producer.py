@@ -0,0 +1,335 @@
+"""
+Offline replay of a recorded DBN trades file through the producer pipeline.
+
+Records go through the same path as the live feed: a reader puts them on the bounded
+TickQueue, the DatabentoLiveManager aggregator thread drains it into one ContractFeed per
+contract, and TickDataBufferWithRedis builds and publishes the bars. Publishing goes to an
+in-memory Redis stand-in unless --redis is given, so nothing touches the network.
+
+    python -m benchmarks.replay_producer path/to/trades.dbn --bar 50t --bar 500v
+    python -m benchmarks.replay_producer --synthetic 1000000 --contracts 8 --speed 0
+    python -m benchmarks.replay_producer trades.dbn --speed 10 --redis redis://localhost:6379/0
+    python -m benchmarks.replay_producer --contracts 8 --rtt-ms 1 --async-publish
+
+--speed 0 replays as fast as possible; --speed N paces ticks at N times their recorded rate.
+--rtt-ms adds a simulated round trip to every pipeline of the in-memory stand-in, and
+--async-publish sends bars through the producer's AsyncBarPublisher instead of blocking
+the aggregator thread on each bar.
+"""
+import argparse
+import asyncio
+import fnmatch
+import os
+import resource
+import sys
+import threading
+import time
+
+from benchmarks.tick_hot_path import synthetic_records
+from bar_publisher import AsyncBarPublisher
+from latency import LatencyRecorder
+from tick_buffer import ContractFeed, DatabentoLiveManager
+from tick_producer import TickDataBufferWithRedis
+from utils import bar_timeframe_key, parse_bar_timeframe
+
+
+class InMemoryRedis:
+    """
+    The subset of redis.Redis the producer uses, kept in process memory. Each pipeline
+    execute() takes rtt seconds, or slow_rtt when it touches a key containing one of slow_keys.
+    """
+
+    def __init__(self, rtt=0.0, slow_keys=(), slow_rtt=0.0):
+        self.published = 0
+        self.zsets = {}
+        self.hashes = {}
+        self.rtt = rtt
+        self.slow_keys = tuple(slow_keys)
+        self.slow_rtt = slow_rtt
+
+    def publish(self, channel, message):
+        self.published += 1
+        return 0
+
+    def xadd(self, name, fields, maxlen=None, approximate=True):
+        self.published += 1
+        return f"{self.published}-0".encode()
+
+    def zadd(self, key, mapping):
+        zset = self.zsets.setdefault(key, {})
+        added = sum(1 for member in mapping if member not in zset)
+        zset.update(mapping)
+        return added
+
+    def _ranked(self, key):
+        return sorted(self.zsets.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+
+    def zrange(self, key, start, end):
+        ranked = self._ranked(key)
+        end = len(ranked) + end if end < 0 else end
+        return [self._bytes(member) for member, _ in ranked[start:end + 1]]
+
+    def zremrangebyrank(self, key, start, end):
+        ranked = self._ranked(key)
+        end = len(ranked) + end if end < 0 else end
+        removed = ranked[start:end + 1]
+        for member, _ in removed:
+            del self.zsets[key][member]
+        return len(removed)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        fields = self.hashes.setdefault(key, {})
+        if field is not None:
+            fields[field] = value
+        fields.update(mapping or {})
+        return 1
+
+    def hgetall(self, key):
+        return {self._bytes(k): self._bytes(v) for k, v in self.hashes.get(key, {}).items()}
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            removed += (self.zsets.pop(key, None) is not None) + (self.hashes.pop(key, None) is not None)
+        return removed
+
+    def pipeline(self, transaction=True):
+        return InMemoryPipeline(self)
+
+    def round_trip(self, commands):
+        """Simulated network time of one pipeline"""
+        for _, args, _ in commands:
+            if args and isinstance(args[0], str) and any(key in args[0] for key in self.slow_keys):
+                return self.slow_rtt
+        return self.rtt
+
+    def keys(self, pattern='*'):
+        return [key.encode() for key in list(self.zsets) + list(self.hashes) if fnmatch.fnmatch(key, pattern)]
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+
+class InMemoryPipeline:
+    """Queues commands and applies them in order on execute(), like a MULTI/EXEC pipeline"""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        delay = self.client.round_trip(commands)
+        if delay:
+            time.sleep(delay)
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
+class AsyncInMemoryRedis(InMemoryRedis):
+    """InMemoryRedis for redis.asyncio callers: pipelines are awaited and wait with asyncio.sleep"""
+
+    def pipeline(self, transaction=True):
+        return AsyncInMemoryPipeline(self)
+
+    async def aclose(self):
+        pass
+
+
+class AsyncInMemoryPipeline(InMemoryPipeline):
+
+    async def execute(self):
+        commands, self.commands = self.commands, []
+        delay = self.client.round_trip(commands)
+        if delay:
+            await asyncio.sleep(delay)
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
+class ReplayTrade:
+    """Attribute view of one trades row, shaped like the databento TradeMsg fields the pipeline reads"""
+    __slots__ = ('ts_event', 'ts_recv', 'price', 'size', 'sequence', 'instrument_id')
+
+    def __init__(self, ts_event, ts_recv, price, size, sequence, instrument_id):
+        self.ts_event = ts_event
+        self.ts_recv = ts_recv
+        self.price = price
+        self.size = size
+        self.sequence = sequence
+        self.instrument_id = instrument_id
+
+
+class ReplayBuffer(TickDataBufferWithRedis):
+    """Times every bar publish and the closing tick's trip from the reader to the end of publish"""
+
+    def __init__(self, *args, stats=None, stats_key=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+        self.stats_key = stats_key or self.timeframe
+
+    def _publish_bar(self, bar):
+        start = time.perf_counter_ns()
+        super()._publish_bar(bar)
+        end = time.perf_counter_ns()
+        # Time the aggregator thread spends handing the bar off (the whole round trip when synchronous)
+        self.stats.record(self.stats_key, 'publish_bar', end - start)
+
+    def _on_published(self, bar_data, published):
+        self.stats.record(self.stats_key, 'tick_to_published', published - bar_data['ts_local'])
+
+
+def load_records(path):
+    import databento as db
+    trades = db.DBNStore.from_file(path).to_ndarray()
+    columns = [trades[name].tolist() for name in ('ts_event', 'ts_recv', 'price', 'size', 'sequence', 'instrument_id')]
+    return [ReplayTrade(*row) for row in zip(*columns)]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def build_feeds(symbol, timeframes, contracts, redis_client, stats, max_period, quiet, stats_key=None):
+    """One ContractFeed per contract; stats_key(ticker, timeframe) groups the timings (default: by timeframe)"""
+    feeds = []
+    for i in range(contracts):
+        ticker = symbol if contracts == 1 else f"{symbol}-{i}"
+        feed = ContractFeed(ticker)
+        for timeframe in timeframes:
+            bar_type, threshold = parse_bar_timeframe(timeframe)
+            buffer = feed.add_buffer(ReplayBuffer(
+                ticker, threshold, redis_client,
+                db_client=object(),  # never used: there is no warmup in a replay
+                max_period=max_period,
+                bar_type=bar_type,
+                multiplier=50,
+                timeframe=bar_timeframe_key(timeframe),
+                stats=stats,
+                stats_key=stats_key(ticker, timeframe) if stats_key else None
+            ))
+            buffer.logger.disabled = quiet
+        feeds.append(feed)
+    return feeds
+
+
+def replay(records, feeds, manager, speed):
+    """Reader side: put every record on the queue for every contract, paced by ts_event when speed > 0"""
+    put = manager.tick_queue.put
+    first_ts = records[0].ts_event
+    start = time.perf_counter_ns()
+    for record in records:
+        if speed > 0:
+            lag = (record.ts_event - first_ts) / speed - (time.perf_counter_ns() - start)
+            if lag > 1_000_000:
+                time.sleep(lag / 1e9)
+        local_ns = time.time_ns()
+        for feed in feeds:
+            put((feed, record, local_ns))
+
+
+def run_replay(records, feeds, speed=0, publisher=None):
+    """
+    Replay records through a TickQueue and aggregator thread into feeds. With a publisher, its
+    event loop runs on its own thread, like the producer's. Returns timings and counters.
+    """
+    manager = DatabentoLiveManager()
+    aggregator = threading.Thread(target=manager._aggregate_loop, name='tick-aggregator', daemon=True)
+    loop = None
+    if publisher is not None:
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name='publisher-loop', daemon=True).start()
+        asyncio.run_coroutine_threadsafe(publisher.start(), loop).result()
+        for feed in feeds:
+            for buffer in feed.buffers.values():
+                buffer.publisher = publisher
+
+    start = time.perf_counter()
+    aggregator.start()
+    replay(records, feeds, manager, speed)
+    read_done = time.perf_counter()
+    manager.tick_queue.close()
+    aggregator.join()
+    if loop is not None:
+        asyncio.run_coroutine_threadsafe(publisher.close(timeout=60), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'elapsed': elapsed,
+        'read_elapsed': read_done - start,
+        'ticks': len(records) * len(feeds),
+        'bars': sum(buffer.bar_history.total for feed in feeds for buffer in feed.buffers.values()),
+        'queue': manager.queue_stats(),
+        'publisher': publisher.stats() if publisher is not None else None,
+    }
+
+
+def print_stages(stats):
+    for key, summary in stats.snapshot().items():
+        for stage, hist in summary['stages'].items():
+            print(f"{key:<8} {stage:<18} p50={hist['p50_us']:>10,.1f}us  p99={hist['p99_us']:>10,.1f}us  "
+                  f"max={hist['max_us']:>10,.1f}us  n={hist['count']:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", help="recorded DBN trades file")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate this many synthetic trades instead")
+    parser.add_argument("--bar", action="append", help="bar timeframe, repeatable (default 50t)")
+    parser.add_argument("--contracts", type=int, default=1, help="replay the feed as this many independent contracts")
+    parser.add_argument("--speed", type=float, default=0, help="multiple of recorded speed, 0 = as fast as possible")
+    parser.add_argument("--max-period", type=int, default=30, help="largest strategy period (sizes the bar history)")
+    parser.add_argument("--redis", help="publish to this Redis URL instead of the in-memory stand-in")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="simulated round trip of the in-memory stand-in")
+    parser.add_argument("--async-publish", action="store_true", help="publish through AsyncBarPublisher")
+    parser.add_argument("--quiet", action="store_true", help="disable the per-bar INFO log")
+    args = parser.parse_args()
+
+    timeframes = args.bar or ["50t"]
+    records = load_records(args.path) if args.path else synthetic_records(args.synthetic or 500_000)
+    if not records:
+        parser.error("no trades to replay")
+    publisher = None
+    if args.redis:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis)
+        if args.async_publish:
+            import redis.asyncio as aioredis
+            publisher = AsyncBarPublisher(aioredis.Redis.from_url(args.redis))
+    else:
+        redis_client = InMemoryRedis(rtt=args.rtt_ms / 1000)
+        if args.async_publish:
+            publisher = AsyncBarPublisher(AsyncInMemoryRedis(rtt=args.rtt_ms / 1000))
+    os.makedirs("logs", exist_ok=True)
+
+    stats = LatencyRecorder('replay')
+    feeds = build_feeds("REPLAY", timeframes, args.contracts, redis_client, stats, args.max_period, args.quiet)
+
+    print(f"{len(records):,} trades x {args.contracts} contract(s), bars {timeframes}, "
+          f"speed {'max' if args.speed <= 0 else f'{args.speed:g}x'}, "
+          f"{'async' if publisher else 'sync'} publish")
+    result = run_replay(records, feeds, args.speed, publisher)
+
+    elapsed = result['elapsed']
+    print(f"elapsed        {elapsed:.3f}s (reader finished after {result['read_elapsed']:.3f}s)")
+    print(f"ticks/sec      {result['ticks'] / elapsed:,.0f}")
+    print(f"bars/sec       {result['bars'] / elapsed:,.0f} ({result['bars']:,} bars)")
+    print(f"peak RSS       {peak_rss_mb():,.1f} MB")
+    print(f"queue          {result['queue']}")
+    if result['publisher']:
+        print(f"publisher      {result['publisher']}")
+    print_stages(stats)
+
+
+if __name__ == "__main__":
+    main()
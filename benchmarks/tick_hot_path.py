@@ -0,0 +1,117 @@
+"""
+Micro-benchmark of the live tick hot path.
+
+Replays the trades of a recorded DBN file (or a synthetic feed) through
+TickDataBuffer.on_trade_record and through the previous per-tick decode
+(pd.to_datetime + float price + tick dict + list-based bar) and prints ticks/sec.
+
+    python -m benchmarks.tick_hot_path path/to/trades.dbn --bar 50t
+    python -m benchmarks.tick_hot_path --synthetic 1000000
+"""
+import argparse
+import os
+import random
+import time
+
+import pandas as pd
+
+from tick_buffer import TickDataBuffer
+from utils import parse_bar_timeframe
+
+
+class SyntheticTrade:
+    __slots__ = ('ts_event', 'ts_recv', 'price', 'size', 'sequence', 'instrument_id')
+
+    def __init__(self, ts_event, price, size, sequence):
+        self.ts_event = ts_event
+        self.ts_recv = ts_event
+        self.price = price
+        self.size = size
+        self.sequence = sequence
+        self.instrument_id = 1
+
+
+def load_records(path):
+    import databento as db
+    store = db.DBNStore.from_file(path)
+    return [record for record in store if isinstance(record, db.TradeMsg)]
+
+
+def synthetic_records(count, seed=7):
+    rng = random.Random(seed)
+    ts = 1_700_000_000_000_000_000
+    price = 5_000_000_000_000  # 5000.00 in fixed-point
+    records = []
+    for sequence in range(count):
+        ts += rng.randint(1_000, 2_000_000)
+        price += rng.choice((-250_000_000, 0, 0, 250_000_000))
+        records.append(SyntheticTrade(ts, price, rng.randint(1, 20), sequence))
+    return records
+
+
+def run_legacy(records, tick_size):
+    """The per-tick work done before raw decoding: one pandas call, a float and a dict per tick."""
+    buffer = []
+    bars = 0
+    for record in records:
+        buffer.append({
+            'timestamp': pd.to_datetime(record.ts_event, unit='ns'),
+            'price': record.price / 1e9,
+            'volume': record.size,
+            'symbol': 'BENCH'
+        })
+        if len(buffer) >= tick_size:
+            prices = [tick['price'] for tick in buffer]
+            {
+                'timestamp': buffer[-1]['timestamp'],
+                'open': prices[0],
+                'high': max(prices),
+                'low': min(prices),
+                'close': prices[-1],
+                'volume': sum(tick['volume'] for tick in buffer)
+            }
+            bars += 1
+            buffer = []
+    return bars
+
+
+def run_current(records, bar_type, threshold):
+    buffer = TickDataBuffer('BENCH', threshold, db_client=object(), bar_type=bar_type, multiplier=50)
+    buffer.logger.disabled = True  # measure the hot path, not the log file
+    for record in records:
+        buffer.on_trade_record(record)
+    return buffer.bar_history.total
+
+
+def timed(label, fn, n_ticks):
+    start = time.perf_counter()
+    bars = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {n_ticks / elapsed:>14,.0f} ticks/sec  {bars:>8} bars  {elapsed:.3f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", help="recorded DBN trades file")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate this many synthetic trades instead")
+    parser.add_argument("--bar", default="50t", help="bar timeframe, e.g. 50t, 500v, 5000000n, 2.5r")
+    args = parser.parse_args()
+
+    if args.path:
+        records = load_records(args.path)
+    else:
+        records = synthetic_records(args.synthetic or 500_000)
+    bar_type, threshold = parse_bar_timeframe(args.bar)
+    os.makedirs("logs", exist_ok=True)
+
+    print(f"{len(records):,} trades, {args.bar} bars")
+    if bar_type == 'tick':
+        legacy = timed("legacy per-tick decode", lambda: run_legacy(records, threshold), len(records))
+    current = timed("raw on_trade_record", lambda: run_current(records, bar_type, threshold), len(records))
+    if bar_type == 'tick':
+        print(f"speedup: {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -45,4 +45,101 @@ parameter_sheet = "Equities"
 link_sheet = "Token_Link"
 
 
-time_zone = "US/Eastern"
\ No newline at end of file
+time_zone = "US/Eastern"
+
+# Extra tick bars kept in each producer ring buffer beyond the largest strategy period
+tick_bar_history_padding = 16
+
+# Local cache of historical Databento records used for producer warmup
+dbn_cache_dir = "dbn_cache"
+dbn_cache_retention_days = 3
+
+# Saved producer state older than this is not resumed (Databento intraday replay covers ~24h)
+live_replay_max_age_hours = 23
+
+# Futures contract multipliers ($ per point), used for notional (dollar) bars
+contract_multipliers = {
+    "ES": 50,
+    "MES": 5,
+    "NQ": 20,
+    "MNQ": 2,
+    "RTY": 50,
+    "M2K": 5,
+}
+
+# Seconds between latency histogram dumps (logs/latency_<process>.json and the latency:<process> hash)
+latency_report_interval = 60
+
+# Live feed reader -> aggregator hand-off. "block" applies backpressure to the socket reader
+# when the queue is full (it waits in an executor thread, so the event loop keeps running);
+# "drop" discards the oldest queued tick instead and counts it in the queue stats.
+tick_queue_capacity = 100_000
+tick_queue_batch_size = 512
+tick_queue_overflow_policy = "block"
+
+# How bars reach the strategy consumer: "pubsub" (tick_bars:* channels, lost while the consumer
+# is down), "streams" (bar_stream:* with a consumer group, acknowledged and caught up on restart)
+# or "shm" (shared memory rings, producer and consumer on the same host)
+bar_transport = "pubsub"
+bar_stream_maxlen = 10_000
+bar_stream_group = "strategy_consumer"
+bar_stream_consumer = "strategy_consumer-1"
+bar_stream_batch_size = 500
+bar_stream_block_ms = 5_000
+
+# Bar serialization in Redis and on the wire: "binary" (versioned fixed layout, see bar_codec.py)
+# or "json" (readable, for consumers that predate the binary format). Readers accept both.
+bar_encoding = "binary"
+
+# Pooled asyncio Redis connections the producer publishes live bars on
+redis_publisher_connections = 8
+
+# bar_transport = "shm": same-host delivery through a shared memory ring per series (see shm_ring.py).
+# Slots hold one encoded bar each; readers more than bar_shm_slots behind fall back to the ZSET.
+# Readers pass an eventfd to the producer over bar_shm_socket to be woken per bar and poll every
+# bar_shm_poll_interval seconds when that is unavailable.
+bar_shm_slots = 1024
+bar_shm_slot_size = 512
+bar_shm_socket = "/tmp/tim_bars.sock"
+bar_shm_poll_interval = 0.0005
+
+# Compute the strategies' EMA / SMA / WilderSmoother trends incrementally per bar (indicators.py)
+# instead of over a fresh DataFrame each run. Seeded from the bars first seen, so EMA and Wilder values
+# follow all bars since then rather than only the last max period + 1 that tick strategies use today.
+# That changes their signals: on 3000 synthetic bars with periods 7/30, 1,184 signals differ from the
+# windowed computation, all in pairs with an EMA or Wilder trend (python -m benchmarks.indicator_parity).
+# Keep off until that change is accepted.
+streaming_indicators = False
+
+# Strategy consumer scheduling (strategy_scheduler.py): threads running strategies (bar data,
+# broker and HTTP calls), threads for session / parameter checks, and how often a tick
+# strategy waiting for bars re-checks its session and time frame
+strategy_workers = 8
+session_check_workers = 2
+tick_strategy_recheck_seconds = 300
+
+# Threads placing orders for the order dispatcher (order_dispatcher.py); each broker's orders for
+# one signal, including the fill checks, hold a thread until they are done
+order_workers = 8
+
+# Seconds between checks of tickers.json for changes by the in-memory strategy parameter store
+strategy_params_poll_interval = 1
+
+# CME Globex sessions per product group (session_calendar.py): pandas_market_calendars calendar
+# with the group's daily halt, holidays and early closes, and the product codes in each group.
+# The producer stops its live sessions once every contract of a dataset is closed (after a grace
+# period for the last trades) and reconnects shortly before the next open.
+globex_calendars = {
+    "equity": "CME Globex Equity",
+    "energy": "CMEGlobex_Energy",
+    "metals": "CMEGlobex_EnergyAndMetals",
+}
+globex_product_groups = {
+    "equity": ["ES", "MES", "NQ", "MNQ", "RTY", "M2K", "YM", "MYM"],
+    "energy": ["CL", "MCL", "QM", "NG", "QG", "RB", "HO"],
+    "metals": ["GC", "MGC", "SI", "SIL", "HG", "MHG", "PL", "PA"],
+}
+globex_close_grace_seconds = 60
+globex_reconnect_lead_seconds = 60
+# Longest a closed futures strategy sleeps before re-checking its session
+globex_max_sleep_seconds = 3600
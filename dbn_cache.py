@@ -0,0 +1,181 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+
+import databento as db
+import numpy as np
+import pandas as pd
+
+from config import dbn_cache_dir, dbn_cache_retention_days
+
+# Fixed layout of a DBN trades record (TradeMsg, 48 bytes), as returned by DBNStore.to_ndarray()
+TRADE_DTYPE = np.dtype([
+    ('length', 'u1'),
+    ('rtype', 'u1'),
+    ('publisher_id', '<u2'),
+    ('instrument_id', '<u4'),
+    ('ts_event', '<u8'),
+    ('price', '<i8'),
+    ('size', '<u4'),
+    ('action', 'S1'),
+    ('side', 'S1'),
+    ('flags', 'u1'),
+    ('depth', 'u1'),
+    ('ts_recv', '<u8'),
+    ('ts_in_delta', '<i4'),
+    ('sequence', '<u4'),
+])
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+
+
+def to_ns(value):
+    """Convert an ISO string, datetime, pd.Timestamp or int ns into int ns since epoch (UTC)."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return ts.value
+
+
+class DBNCache:
+    """
+    On-disk cache of historical Databento records, one directory per dataset/schema/symbol.
+
+    Each fetched time range is stored as an uncompressed DBN file and listed in that
+    directory's index.json. Coverage is the merged union of those ranges, so a request
+    only downloads the parts of [start, end) that are not on disk yet. Trades files
+    are read by memory-mapping the DBN body straight into a NumPy record array.
+    Ranges filter on ts_recv, like timeseries.get_range.
+    """
+
+    def __init__(self, db_client, root=dbn_cache_dir, retention_days=dbn_cache_retention_days):
+        self.db_client = db_client
+        self.root = root
+        self.retention_days = retention_days
+        self.logger = logging.getLogger('DBNCache')
+
+    def _key_dir(self, dataset, schema, symbol):
+        return os.path.join(self.root, dataset, schema, symbol.replace('/', '_'))
+
+    def _load_index(self, key_dir):
+        try:
+            with open(os.path.join(key_dir, "index.json"), "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def _save_index(self, key_dir, segments):
+        tmp_path = os.path.join(key_dir, "index.json.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(segments, file)
+        os.replace(tmp_path, os.path.join(key_dir, "index.json"))
+
+    @staticmethod
+    def covered_ranges(segments):
+        """Union of the segment ranges as a sorted list of disjoint [start, end) pairs."""
+        merged = []
+        for seg in sorted(segments, key=lambda s: s['start']):
+            if merged and seg['start'] <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], seg['end'])
+            else:
+                merged.append([seg['start'], seg['end']])
+        return merged
+
+    @classmethod
+    def missing_ranges(cls, segments, start_ns, end_ns):
+        """Parts of [start_ns, end_ns) not covered by any cached segment."""
+        missing = []
+        cursor = start_ns
+        for cov_start, cov_end in cls.covered_ranges(segments):
+            if cov_end <= cursor:
+                continue
+            if cov_start >= end_ns:
+                break
+            if cov_start > cursor:
+                missing.append((cursor, cov_start))
+            cursor = max(cursor, cov_end)
+        if cursor < end_ns:
+            missing.append((cursor, end_ns))
+        return missing
+
+    def _fetch_segment(self, key_dir, dataset, schema, symbol, start_ns, end_ns):
+        self.logger.info(f"Downloading {dataset}/{schema}/{symbol} [{start_ns}, {end_ns}) into cache")
+        data = self.db_client.timeseries.get_range(
+            dataset=dataset,
+            symbols=[symbol],
+            schema=schema,
+            start=start_ns,
+            end=end_ns
+        )
+        filename = f"{start_ns}_{end_ns}.dbn"
+        tmp_path = os.path.join(key_dir, filename + ".tmp")
+        # DBNStore.reader yields the decompressed stream, so the cached file can be mapped directly
+        with open(tmp_path, "wb") as file:
+            shutil.copyfileobj(data.reader, file)
+        os.replace(tmp_path, os.path.join(key_dir, filename))
+        return {'start': start_ns, 'end': end_ns, 'file': filename}
+
+    def _read_segment(self, path, schema):
+        if schema != 'trades':
+            return db.DBNStore.from_file(path).to_ndarray()
+
+        with open(path, "rb") as file:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:3] != b"DBN":
+            raise ValueError(f"{path} is not an uncompressed DBN file")
+        body_offset = 8 + struct.unpack_from("<I", mm, 4)[0]
+        count = (len(mm) - body_offset) // TRADE_DTYPE.itemsize
+        if count and mm[body_offset] * 4 != TRADE_DTYPE.itemsize:
+            # Unexpected record layout; let databento decode it
+            return db.DBNStore.from_file(path).to_ndarray()
+        # The array keeps the mapping alive; pages are only touched when sliced
+        return np.frombuffer(mm, dtype=TRADE_DTYPE, count=count, offset=body_offset)
+
+    def _prune(self, key_dir, segments, now_ns):
+        cutoff = now_ns - self.retention_days * NS_PER_DAY
+        kept = []
+        for seg in segments:
+            if seg['end'] < cutoff:
+                try:
+                    os.remove(os.path.join(key_dir, seg['file']))
+                except FileNotFoundError:
+                    pass
+            else:
+                kept.append(seg)
+        return kept
+
+    def get_range(self, dataset, symbol, start, end, schema='trades'):
+        """Return the records for [start, end) as a NumPy record array, downloading only uncached gaps."""
+        start_ns = to_ns(start)
+        end_ns = to_ns(end)
+        key_dir = self._key_dir(dataset, schema, symbol)
+        os.makedirs(key_dir, exist_ok=True)
+
+        segments = self._prune(key_dir, self._load_index(key_dir), end_ns)
+        for gap_start, gap_end in self.missing_ranges(segments, start_ns, end_ns):
+            segments.append(self._fetch_segment(key_dir, dataset, schema, symbol, gap_start, gap_end))
+            self._save_index(key_dir, segments)
+        self._save_index(key_dir, segments)
+
+        parts = []
+        cursor = start_ns
+        for seg in sorted(segments, key=lambda s: s['start']):
+            # Segments can overlap, so only take the part of each one not already read
+            lo = max(seg['start'], cursor)
+            hi = min(seg['end'], end_ns)
+            if lo >= hi:
+                continue
+            records = self._read_segment(os.path.join(key_dir, seg['file']), schema)
+            if len(records):
+                i, j = np.searchsorted(records['ts_recv'], [lo, hi], side='left')
+                parts.append(records[i:j])
+            cursor = hi
+
+        if not parts:
+            return np.empty(0, dtype=TRADE_DTYPE if schema == 'trades' else None)
+        return np.concatenate(parts)
@@ -0,0 +1,133 @@
+import math
+
+import numpy as np
+
+
+class ExponentialSmoother:
+    """
+    Recursive smoother seeded like pandas_ta.ema (presma) and utils.wilders_smoothing: NaN for the
+    first length - 1 values, the mean of the first length values, then y = (1 - alpha) * y + alpha * x.
+    """
+
+    def __init__(self, length, alpha):
+        self.length = length
+        self.alpha = alpha
+        self.decay = 1.0 - alpha
+        self.seed = []
+        self.value = math.nan
+        self.prev_value = math.nan
+        self._undo = None
+
+    def update(self, x):
+        self._undo = (self.value, self.prev_value, len(self.seed))
+        self.prev_value = self.value
+        if len(self.seed) < self.length:
+            self.seed.append(x)
+            if len(self.seed) == self.length:
+                self.value = np.sum(self.seed) / self.length  # summed like the pandas mean it replaces
+        else:
+            # Same arithmetic as pandas ewm(adjust=False), so values match it bit for bit
+            self.value = (self.decay * self.value + self.alpha * x) / (self.decay + self.alpha)
+        return self.value
+
+    def revise(self, x):
+        """Replace the most recent value passed to update() (a bar that was still forming)"""
+        self.value, self.prev_value, seeded = self._undo
+        del self.seed[seeded:]
+        return self.update(x)
+
+
+class EMA(ExponentialSmoother):
+    def __init__(self, length):
+        super().__init__(length, 2.0 / (length + 1))
+
+
+class WilderSmoother(ExponentialSmoother):
+    def __init__(self, length):
+        super().__init__(length, 1.0 / length)
+
+
+class SMA:
+    """Rolling mean over the last length values from a running sum, NaN until length values are seen"""
+
+    def __init__(self, length):
+        self.length = length
+        self.window = np.zeros(length)
+        self.count = 0
+        self.total = 0.0
+        self.value = math.nan
+        self.prev_value = math.nan
+        self._undo = None
+
+    def update(self, x):
+        i = self.count % self.length
+        self._undo = (self.value, self.prev_value, self.total, self.window[i])
+        self.prev_value = self.value
+        self.total += x - self.window[i]
+        self.window[i] = x
+        self.count += 1
+        if i == self.length - 1:
+            # Re-sum once per lap so rounding errors in the running sum cannot build up
+            self.total = self.window.sum()
+        if self.count >= self.length:
+            self.value = self.total / self.length
+        return self.value
+
+    def revise(self, x):
+        """Replace the most recent value passed to update() (a bar that was still forming)"""
+        self.count -= 1
+        self.value, self.prev_value, self.total, self.window[self.count % self.length] = self._undo
+        return self.update(x)
+
+
+INDICATORS = {
+    "EMA": EMA,
+    "SMA": SMA,
+    "WilderSmoother": WilderSmoother,
+}
+
+
+class IndicatorEngine:
+    """
+    Streaming trend indicators for one bar series, updated in O(1) per bar instead of being
+    recomputed over a DataFrame on every strategy run.
+
+    sync() is handed the series' bar history (timestamps and closes, oldest first) each time:
+    bars after the last one seen are fed to every indicator, a changed close on that last bar
+    revises it, and history that no longer contains it (a reseed, a gap) starts the indicators
+    over from the history given. Indicators are created on first request, seeded from the same
+    history, so they match pandas_ta / wilders_smoothing run over the bars seen since then.
+    """
+
+    def __init__(self):
+        self.indicators = {}  # (kind, length) -> indicator
+        self.last_ts = None
+        self.last_close = None
+
+    def sync(self, timestamps, closes, specs):
+        """Bring the engine up to date and return {(kind, length): (previous value, last value)} for specs"""
+        start = 0
+        if self.last_ts is not None:
+            i = int(np.searchsorted(timestamps, self.last_ts))
+            if i < len(timestamps) and timestamps[i] == self.last_ts:
+                if closes[i] != self.last_close:
+                    for indicator in self.indicators.values():
+                        indicator.revise(float(closes[i]))
+                start = i + 1
+            else:
+                self.indicators.clear()
+
+        if self.indicators:
+            for x in closes[start:].tolist():
+                for indicator in self.indicators.values():
+                    indicator.update(x)
+        for kind, length in specs:
+            if (kind, length) not in self.indicators:
+                indicator = self.indicators[(kind, length)] = INDICATORS[kind](length)
+                for x in closes.tolist():
+                    indicator.update(x)
+
+        if len(timestamps):
+            self.last_ts = timestamps[-1]
+            self.last_close = closes[-1]
+        return {spec: (self.indicators[spec].prev_value, self.indicators[spec].value) for spec in specs}
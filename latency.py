@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# Bars whose closing tick reached us this late are intraday replay, not live latency
+REPLAY_CUTOFF_NS = 60 * 1_000_000_000
+
+# Producer stages, measured from the timestamps carried in each bar message
+PRODUCER_STAGES = (
+    ('exchange_to_gateway', 'ts_event', 'ts_recv'),
+    ('gateway_to_local', 'ts_recv', 'ts_local'),
+    ('local_to_bar_close', 'ts_local', 'ts_close'),
+    ('bar_close_to_publish', 'ts_close', 'ts_publish'),
+    ('exchange_to_publish', 'ts_event', 'ts_publish'),
+)
+
+# Consumer stages, measured against the producer's publish time and the exchange time
+CONSUMER_STAGES = (
+    ('publish_to_receive', 'ts_publish', 'ts_receive'),
+    ('receive_to_strategy', 'ts_receive', 'ts_strategy'),
+    ('strategy_to_order', 'ts_strategy', 'ts_order'),
+    ('exchange_to_order', 'ts_event', 'ts_order'),
+)
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram in nanoseconds: exact below 32ns, then 16 buckets per
+    power of two (about 6% relative error). record() is O(1) and never allocates.
+    """
+
+    SUB_BUCKETS = 16
+
+    def __init__(self):
+        self.counts = [0] * (self.SUB_BUCKETS * 61)
+        self.count = 0
+        self.max = 0
+        self.negative = 0  # clock skew between exchange, gateway and local clocks
+
+    @classmethod
+    def _index(cls, value):
+        if value < 2 * cls.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - 5
+        return cls.SUB_BUCKETS * shift + (value >> shift)
+
+    @classmethod
+    def _upper_bound(cls, index):
+        if index < 2 * cls.SUB_BUCKETS:
+            return index
+        shift = index // cls.SUB_BUCKETS - 1
+        return ((index - cls.SUB_BUCKETS * shift + 1) << shift) - 1
+
+    def record(self, value):
+        if value < 0:
+            self.negative += 1
+            value = 0
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * pct // 100))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'p50_us': round(self.percentile(50) / 1000, 1),
+            'p99_us': round(self.percentile(99) / 1000, 1),
+            'max_us': round(self.max / 1000, 1),
+            'negative': self.negative,
+        }
+
+
+class LatencyRecorder:
+    """Per-symbol, per-stage latency histograms that can be dumped to a file or scraped from Redis."""
+
+    def __init__(self, name):
+        self.name = name
+        self.histograms = {}  # symbol -> stage -> LatencyHistogram
+        self.replayed = {}  # symbol -> bars skipped as intraday replay
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(f'Latency.{name}')
+
+    def record(self, symbol, stage, value_ns):
+        with self.lock:
+            stages = self.histograms.setdefault(symbol, {})
+            histogram = stages.get(stage)
+            if histogram is None:
+                histogram = stages[stage] = LatencyHistogram()
+            histogram.record(value_ns)
+
+    def record_stages(self, symbol, timestamps, stages):
+        """Record every stage whose two timestamps are present in `timestamps` (a bar message dict)."""
+        ts_recv = timestamps.get('ts_recv')
+        ts_local = timestamps.get('ts_local')
+        if ts_recv and ts_local and ts_local - ts_recv > REPLAY_CUTOFF_NS:
+            with self.lock:
+                self.replayed[symbol] = self.replayed.get(symbol, 0) + 1
+            return
+        for stage, start_field, end_field in stages:
+            start = timestamps.get(start_field)
+            end = timestamps.get(end_field)
+            if start and end:
+                self.record(symbol, stage, end - start)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                symbol: {
+                    'stages': {stage: hist.summary() for stage, hist in stages.items()},
+                    'replayed_bars': self.replayed.get(symbol, 0),
+                }
+                for symbol, stages in self.histograms.items()
+            }
+
+    def dump(self, path=None):
+        """Write the current snapshot as JSON (default logs/latency_<name>.json) and return it."""
+        snapshot = self.snapshot()
+        path = path or f"logs/latency_{self.name}.json"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            json.dump({'generated_at_ns': time.time_ns(), 'symbols': snapshot}, file, indent=2)
+        return snapshot
+
+    def publish(self, redis_client):
+        """Store one JSON summary per symbol in the latency:<name> hash so it can be scraped."""
+        snapshot = self.snapshot()
+        if snapshot:
+            redis_client.hset(
+                f"latency:{self.name}",
+                mapping={symbol: json.dumps(summary) for symbol, summary in snapshot.items()}
+            )
+        return snapshot
+
+    def report(self, redis_client=None):
+        try:
+            self.dump()
+            if redis_client is not None:
+                self.publish(redis_client)
+        except Exception as e:
+            self.logger.error(f"Failed to report latency histograms: {e}")
@@ -4,10 +4,17 @@ from time import sleep
 from datetime import datetime
 from config import *
 from utils import *
-from schwab import historical_data, place_order
+from schwab import historical_data
 import pandas_ta as ta
 import schedule
-from tastytrade import place_tastytrade_order
+from indicators import IndicatorEngine
+from order_dispatcher import OrderDispatcher, OrderIntent, read_positions, update_positions
+
+# ticker -> IndicatorEngine, kept across strategy runs when config.streaming_indicators is on
+indicator_engines = {}
+
+# Places the strategies' Schwab and Tastytrade orders in parallel, off the strategy threads
+order_dispatcher = OrderDispatcher()
 
 
 def strategy(ticker, logger):
@@ -16,19 +23,11 @@ def strategy(ticker, logger):
         [time_frame, schwab_qty, trade_flag, period1, trend_line1, period2, trend_line2, tasty_qty] = (
             get_strategy_prarams(ticker, logger)
         )
+        trade_file_path = f"trades/{ticker[1:] if '/' == ticker[0] else ticker}.json"
         if trade_flag != "TRUE":
             logger.info(f"Skipping strategy for {ticker}, trade flag is FALSE.")
-            with open(
-                f"trades/{ticker[1:] if '/' == ticker[0] else ticker}.json", "r"
-            ) as file:
-                trades = json.load(file)
-            if ticker in trades:
-                trades = {}
-                with open(
-                    f"trades/{ticker[1:] if '/' == ticker[0] else ticker}.json",
-                    "w",
-                ) as file:
-                    json.dump(trades, file)
+            if ticker in read_positions(trade_file_path):
+                update_positions(trade_file_path, dict.clear)
             return
 
         logger.info(
@@ -37,10 +36,7 @@ def strategy(ticker, logger):
 
         schwab_qty = int(schwab_qty)
         tasty_qty = int(tasty_qty)
-        with open(
-            f"trades/{ticker[1:] if '/' == ticker[0] else ticker}.json", "r"
-        ) as file:
-            trades = json.load(file)
+        trades = read_positions(trade_file_path)  # shared with the order dispatcher's fill updates
 
         df = historical_data(
             ticker,
@@ -48,65 +44,61 @@ def strategy(ticker, logger):
             logger=logger,
         )
 
-        if trend_line1 == "EMA":
-            df["trend1"] = ta.ema(df["close"], length=int(period1))
-        elif trend_line1 == "SMA":
-            df["trend1"] = ta.sma(df["close"], length=int(period1))
-        elif trend_line1 == "WilderSmoother":
-            df["trend1"] = wilders_smoothing(df, length=int(period1))
-
-        if trend_line2 == "EMA":
-            df["trend2"] = ta.ema(df["close"], length=int(period2))
-        elif trend_line2 == "SMA":
-            df["trend2"] = ta.sma(df["close"], length=int(period2))
-        elif trend_line2 == "WilderSmoother":
-            df["trend2"] = wilders_smoothing(df, length=int(period2))
+        if streaming_indicators:
+            # Only bars newer than the last run (and a revised last bar) reach the indicators
+            specs = ((trend_line1, int(period1)), (trend_line2, int(period2)))
+            engine = indicator_engines.setdefault(ticker, IndicatorEngine())
+            trends = engine.sync(pd.DatetimeIndex(df["datetime"]).asi8, df["close"].to_numpy(), specs)
+            trend1, trend2 = trends[specs[0]], trends[specs[1]]
+        else:
+            if trend_line1 == "EMA":
+                df["trend1"] = ta.ema(df["close"], length=int(period1))
+            elif trend_line1 == "SMA":
+                df["trend1"] = ta.sma(df["close"], length=int(period1))
+            elif trend_line1 == "WilderSmoother":
+                df["trend1"] = wilders_smoothing(df, length=int(period1))
+
+            if trend_line2 == "EMA":
+                df["trend2"] = ta.ema(df["close"], length=int(period2))
+            elif trend_line2 == "SMA":
+                df["trend2"] = ta.sma(df["close"], length=int(period2))
+            elif trend_line2 == "WilderSmoother":
+                df["trend2"] = wilders_smoothing(df, length=int(period2))
+
+            # (previous, last) value of each trend
+            trend1 = tuple(df["trend1"].iloc[-2:])
+            trend2 = tuple(df["trend2"].iloc[-2:])
 
         Long_condition = (
-            df.iloc[-1]["trend1"] > df.iloc[-1]["trend2"]
-            and df.iloc[-2]["trend1"] < df.iloc[-2]["trend2"]
+            trend1[1] > trend2[1]
+            and trend1[0] < trend2[0]
         )
         Short_condition = (
-            df.iloc[-1]["trend1"] < df.iloc[-1]["trend2"]
-            and df.iloc[-2]["trend1"] > df.iloc[-2]["trend2"]
+            trend1[1] < trend2[1]
+            and trend1[0] > trend2[0]
         )
 
+        # Orders are queued; the position is recorded as PENDING until both brokers have placed them
+        quantities = {"schwab": schwab_qty, "tastytrade": tasty_qty}
         if ticker not in trades.copy():
             if Long_condition:
                 logger.info(f"Long condition triggered for {ticker}")
-                order_id_schwab = place_order(ticker, schwab_qty, "BUY", account_id, logger, "OPENING") if schwab_qty > 0 else 0
-                order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Buy to Open", account_id, logger) if tasty_qty > 0 else 0
-                trades[ticker] = {"action": "LONG", "order_id_schwab": order_id_schwab, "order_id_tastytrade": order_id_tastytrade}
+                order_dispatcher.submit(OrderIntent(ticker, "LONG", None, quantities, trade_file_path, logger))
             elif Short_condition:
                 logger.info(f"Short condition triggered for {ticker}")
-                order_id_schwab = place_order(ticker, schwab_qty, "SELL_SHORT", account_id, logger, "OPENING") if schwab_qty > 0 else 0
-                order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Sell to Open", account_id, logger) if tasty_qty > 0 else 0
-                trades[ticker] = {"action": "SHORT", "order_id_schwab": order_id_schwab, "order_id_tastytrade": order_id_tastytrade}
+                order_dispatcher.submit(OrderIntent(ticker, "SHORT", None, quantities, trade_file_path, logger))
         else:
             if trades[ticker]["action"] == "LONG" and Short_condition:
                 logger.info(
                     f"Reversing position for {ticker}: Closing LONG, opening SHORT"
                 )
-                long_order_id_schwab = place_order(ticker, schwab_qty, "SELL", account_id, logger, "CLOSING") if schwab_qty > 0 else 0
-                long_order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Sell to Close", account_id, logger) if tasty_qty > 0 else 0
-                short_order_id_schwab = place_order(ticker, schwab_qty, "SELL_SHORT", account_id, logger, "OPENING") if schwab_qty > 0 else 0
-                short_order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Sell to Open", account_id, logger) if tasty_qty > 0 else 0
-                trades[ticker] = {"action": "SHORT", "order_id_schwab": short_order_id_schwab, "order_id_tastytrade": short_order_id_tastytrade}
+                order_dispatcher.submit(OrderIntent(ticker, "SHORT", "LONG", quantities, trade_file_path, logger))
 
             elif trades[ticker]["action"] == "SHORT" and Long_condition:
                 logger.info(
                     f"Reversing position for {ticker}: Closing SHORT, opening LONG"
                 )
-                short_order_id_schwab = place_order(ticker, schwab_qty, "BUY_TO_COVER", account_id, logger, "CLOSING") if schwab_qty > 0 else 0
-                short_order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Buy to Close", account_id, logger) if tasty_qty > 0 else 0
-                long_order_id_schwab = place_order(ticker, schwab_qty, "BUY", account_id, logger, "OPENING") if schwab_qty > 0 else 0
-                long_order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Buy to Open", account_id, logger) if tasty_qty > 0 else 0
-                trades[ticker] = {"action": "LONG", "order_id_schwab": long_order_id_schwab, "order_id_tastytrade": long_order_id_tastytrade}
-
-        with open(
-            f"trades/{ticker[1:] if '/' == ticker[0] else ticker}.json", "w"
-        ) as file:
-            json.dump(trades.copy(), file)
+                order_dispatcher.submit(OrderIntent(ticker, "LONG", "SHORT", quantities, trade_file_path, logger))
 
         logger.info(f"Strategy for {ticker} completed.")
 
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from config import account_id, order_workers
+from schwab import place_order
+from tastytrade import place_tastytrade_order
+
+# (position, position effect) -> each broker's order instruction
+SCHWAB_INSTRUCTIONS = {
+    ("LONG", "OPENING"): "BUY",
+    ("SHORT", "OPENING"): "SELL_SHORT",
+    ("LONG", "CLOSING"): "SELL",
+    ("SHORT", "CLOSING"): "BUY_TO_COVER",
+}
+TASTYTRADE_ACTIONS = {
+    ("LONG", "OPENING"): "Buy to Open",
+    ("SHORT", "OPENING"): "Sell to Open",
+    ("LONG", "CLOSING"): "Sell to Close",
+    ("SHORT", "CLOSING"): "Buy to Close",
+}
+
+
+def place_schwab_order(symbol, qty, position, position_effect, logger):
+    return place_order(symbol, qty, SCHWAB_INSTRUCTIONS[position, position_effect], account_id, logger,
+                       position_effect)
+
+
+def place_tasty_order(symbol, qty, position, position_effect, logger):
+    return place_tastytrade_order(symbol, qty, TASTYTRADE_ACTIONS[position, position_effect], account_id, logger)
+
+
+# broker -> order call; each blocks until its order is filled, rejected or re-placed
+BROKERS = {
+    "schwab": place_schwab_order,
+    "tastytrade": place_tasty_order,
+}
+
+_positions_lock = threading.Lock()
+
+
+def read_positions(path):
+    """The trades/*.json position file as a dict ({} if it does not exist yet)"""
+    with _positions_lock:
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as file:
+            return json.load(file)
+
+
+def update_positions(path, update):
+    """Read-modify-write of a trades/*.json position file; update(trades) changes the dict in place"""
+    with _positions_lock:
+        trades = {}
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                trades = json.load(file)
+        update(trades)
+        with open(path, "w") as file:
+            json.dump(trades, file)
+    return trades
+
+
+class OrderIntent(NamedTuple):
+    """Take ticker's position to position ('LONG' / 'SHORT'), closing close_position ('LONG' / 'SHORT') first if set"""
+    ticker: str  # what the brokers trade, and the key of its position in positions_path
+    position: str
+    close_position: str
+    quantities: dict  # broker -> quantity; brokers with 0 are skipped
+    positions_path: str
+    logger: logging.Logger
+
+
+class OrderDispatcher:
+    """
+    Places strategies' orders off the strategy threads.
+
+    submit() records the intended position in the ticker's position file with status PENDING and
+    returns at once. Each broker's orders for an intent (close, then open) run as one job on an
+    order_workers thread pool, so the brokers are driven in parallel and a slow fill check on one
+    does not hold up the other. When all brokers are done, their opening order ids and a status
+    (PLACED, or FAILED if any broker returned no order id) are written back to the position,
+    unless a later intent has already replaced it. Intents for one ticker run one at a time, in
+    submission order, so a reversal never overtakes the order it reverses.
+    """
+
+    def __init__(self, workers=order_workers):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='order')
+        self.waiting = {}  # ticker -> deque of intents queued behind the one in flight
+        self.latest = {}  # ticker -> last intent submitted, the one its position file shows
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger('OrderDispatcher')
+
+    def submit(self, intent):
+        def record_intent(trades):
+            trades[intent.ticker] = {"action": intent.position, "status": "PENDING",
+                                     **{f"order_id_{broker}": "" for broker in BROKERS}}
+
+        with self.lock:
+            update_positions(intent.positions_path, record_intent)
+            self.latest[intent.ticker] = intent
+            waiting = self.waiting.get(intent.ticker)
+            if waiting is not None:
+                waiting.append(intent)
+                intent.logger.info(f"Queued {intent.position} orders for {intent.ticker} behind the ones in flight")
+                return
+            self.waiting[intent.ticker] = deque()
+        self._start(intent)
+
+    def _start(self, intent):
+        brokers = [broker for broker, qty in intent.quantities.items() if qty > 0]
+        if not brokers:
+            self._finish(intent, {})
+            return
+        order_ids = {}
+
+        def broker_done(broker, future):
+            with self.lock:
+                order_ids[broker] = future.result()
+                done = len(order_ids) == len(brokers)
+            if done:
+                self._finish(intent, order_ids)
+
+        for broker in brokers:
+            future = self.executor.submit(self._place, broker, intent)
+            future.add_done_callback(lambda future, broker=broker: broker_done(broker, future))
+
+    def _place(self, broker, intent):
+        """One broker's orders for the intent; returns the opening order id ('' on failure)"""
+        place = BROKERS[broker]
+        qty = intent.quantities[broker]
+        try:
+            if intent.close_position:
+                place(intent.ticker, qty, intent.close_position, "CLOSING", intent.logger)
+            return place(intent.ticker, qty, intent.position, "OPENING", intent.logger) or ""
+        except Exception as e:
+            intent.logger.error(f"Error placing {broker} orders for {intent.ticker}: {e}", exc_info=True)
+            return ""
+
+    def _finish(self, intent, order_ids):
+        try:
+            self._record_fill(intent, order_ids)
+        except Exception as e:
+            intent.logger.error(f"Error recording orders for {intent.ticker}: {e}", exc_info=True)
+
+        with self.lock:
+            waiting = self.waiting[intent.ticker]
+            next_intent = waiting.popleft() if waiting else None
+            if next_intent is None:
+                del self.waiting[intent.ticker]
+        if next_intent is not None:
+            self._start(next_intent)
+
+    def _record_fill(self, intent, order_ids):
+        status = "PLACED" if all(order_ids.values()) else "FAILED"
+
+        def record(trades):
+            position = trades.get(intent.ticker)
+            if position is None or position.get("action") != intent.position:
+                return  # cleared meanwhile
+            position.update({f"order_id_{broker}": order_id for broker, order_id in order_ids.items()})
+            position["status"] = status
+
+        with self.lock:
+            if self.latest.get(intent.ticker) is not intent:
+                return  # a later intent's position is in the file
+            update_positions(intent.positions_path, record)
+        intent.logger.info(f"{intent.position} orders for {intent.ticker} {status.lower()}: {order_ids}")
@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+
+from config import strategy_params_poll_interval, tickers_path
+
+
+class StrategyParams(NamedTuple):
+    """One row of tickers.json; unpacks like the list it replaces"""
+    time_frame: str
+    schwab_qty: int
+    trade_flag: str
+    period1: int
+    trend_line1: str
+    period2: int
+    trend_line2: str
+    tasty_qty: int
+
+    @classmethod
+    def parse(cls, values):
+        time_frame, schwab_qty, trade_flag, period1, trend_line1, period2, trend_line2, tasty_qty = values
+        return cls(str(time_frame), int(schwab_qty), str(trade_flag), int(period1), str(trend_line1),
+                   int(period2), str(trend_line2), int(tasty_qty))
+
+
+class ParamStore:
+    """
+    Parsed strategy parameters (ticker -> StrategyParams), kept in memory and reloaded when
+    tickers.json changes.
+
+    A watcher thread compares the file's mtime and size every poll_interval seconds. A reload
+    parses the whole file and swaps in a new read-only mapping, so readers see either the old
+    or the new parameters, never a mix. A file that does not parse (e.g. caught mid-write by the
+    sheet sync) keeps the previous parameters and is retried on the next poll; a row that does
+    not parse drops only that ticker. Callbacks registered with on_change(callback) are called
+    from the watcher thread as callback(old, new) after each swap that changed something.
+    """
+
+    def __init__(self, path=tickers_path, poll_interval=strategy_params_poll_interval):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.params = MappingProxyType({})
+        self.signature = None  # (mtime_ns, size) of the file the parameters were parsed from
+        self.failed_signature = None  # of the last file that did not parse, retried once it changes
+        self.callbacks = []
+        self.lock = threading.Lock()
+        self.watcher = None
+        self.logger = logging.getLogger('ParamStore')
+
+    def get(self, ticker):
+        """The ticker's StrategyParams, or None if it is not in the file"""
+        return self.params.get(ticker)
+
+    def on_change(self, callback):
+        self.callbacks.append(callback)
+
+    def reload(self, force=False):
+        """Re-parse the file if it changed since the last load; returns True when new parameters were swapped in"""
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if signature in (self.signature, self.failed_signature) and not force:
+                    return False
+                with open(self.path, "r") as file:
+                    raw = json.load(file)
+                if not isinstance(raw, dict):
+                    raise ValueError("expected an object of ticker -> params")
+            except (OSError, ValueError) as e:
+                self.failed_signature = signature if isinstance(e, ValueError) else None
+                self.logger.error(f"Error in loading strategy params from {self.path}: {e}")
+                return False
+
+            params = {}
+            for ticker, values in raw.items():
+                try:
+                    params[ticker] = StrategyParams.parse(values)
+                except (TypeError, ValueError) as e:
+                    self.logger.error(f"Invalid strategy params for {ticker} {values}: {e}")
+            old, new = self.params, MappingProxyType(params)
+            self.params = new
+            self.signature = signature
+
+        if old != new:
+            self.logger.info(f"Loaded strategy params for {len(params)} tickers from {self.path}")
+            for callback in self.callbacks:
+                try:
+                    callback(old, new)
+                except Exception as e:
+                    self.logger.error(f"Error in strategy params change callback: {e}", exc_info=True)
+        return True
+
+    def start(self):
+        if self.watcher is None:
+            self.watcher = threading.Thread(target=self._watch, name='param-store', daemon=True)
+            self.watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.reload()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def strategy_param_store():
+    """The process-wide ParamStore for tickers_path, loaded and watched from the first call"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ParamStore()
+            _store.reload()
+            _store.start()
+    return _store
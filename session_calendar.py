@@ -0,0 +1,205 @@
+import bisect
+import logging
+import re
+import threading
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pandas_market_calendars as mcal
+from pytz import timezone
+
+from config import globex_calendars, globex_product_groups, time_zone
+
+
+class SessionCalendar:
+    """
+    NYSE sessions, holidays and the futures trading week (Sunday 18:00 to Friday 17:00, time_zone)
+    for a range of days, built once as sorted arrays so every lookup is a bisect instead of
+    a fresh exchange calendar.
+    """
+
+    def __init__(self, first_day, last_day):
+        self.first_day = first_day
+        self.last_day = last_day
+        tz = timezone(time_zone)
+        nyse = mcal.get_calendar("NYSE")
+
+        schedule = nyse.schedule(first_day, last_day, tz=tz)
+        self.session_days = [day.toordinal() for day in schedule.index.date]
+        # Same values get_market_hours always returned: open and the last minute before the close
+        self.session_hours = [
+            (market_open.time(), (market_close - timedelta(minutes=1)).time())
+            for market_open, market_close in zip(schedule["market_open"], schedule["market_close"])
+        ]
+
+        holidays = pd.DatetimeIndex(nyse.holidays().holidays)
+        self.holidays = sorted(day.toordinal() for day in holidays.date if first_day <= day <= last_day)
+
+        # Trading weeks as epoch seconds, one per Sunday in range
+        self.week_opens = []
+        self.week_closes = []
+        sunday = first_day + timedelta(days=(6 - first_day.weekday()) % 7)
+        while sunday <= last_day:
+            week_open = tz.localize(datetime(sunday.year, sunday.month, sunday.day, 18))
+            friday = sunday + timedelta(days=5)
+            week_close = tz.localize(datetime(friday.year, friday.month, friday.day, 17))
+            self.week_opens.append(week_open.timestamp())
+            self.week_closes.append(week_close.timestamp())
+            sunday += timedelta(days=7)
+
+    def covers(self, day):
+        return self.first_day <= day <= self.last_day
+
+    def is_holiday(self, day):
+        ordinal = day.toordinal()
+        i = bisect.bisect_left(self.holidays, ordinal)
+        return i < len(self.holidays) and self.holidays[i] == ordinal
+
+    def market_hours(self, day):
+        """(open, last minute before close) in time_zone and a status, or (None, reason) when there is no session"""
+        if day.weekday() >= 5:
+            return None, "Market closed on weekends"
+        if self.is_holiday(day):
+            return None, "Market closed due to holiday"
+        ordinal = day.toordinal()
+        i = bisect.bisect_left(self.session_days, ordinal)
+        if i == len(self.session_days) or self.session_days[i] != ordinal:
+            return None, "Market closed"
+        return self.session_hours[i], "Regular trading day"
+
+    def in_trading_week(self, moment):
+        """True between Sunday 18:00 and Friday 17:00 (time_zone) of the week containing moment"""
+        ts = moment.timestamp()
+        i = bisect.bisect_right(self.week_opens, ts) - 1
+        return i >= 0 and ts <= self.week_closes[i]
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def session_calendar(day=None):
+    """The process-wide SessionCalendar, rebuilt for the surrounding years when day falls outside it"""
+    global _calendar
+    if day is None:
+        day = datetime.now(tz=timezone(time_zone)).date()
+    calendar = _calendar
+    if calendar is not None and calendar.covers(day):
+        return calendar
+    with _calendar_lock:
+        if _calendar is None or not _calendar.covers(day):
+            # From the last week of the previous year, so early January still finds its trading week
+            _calendar = SessionCalendar(date(day.year - 1, 12, 24), date(day.year + 1, 12, 31))
+        return _calendar
+
+
+_CONTRACT_SYMBOL = re.compile(r'^([A-Z0-9]+?)[FGHJKMNQUVXZ]\d{1,2}$')
+
+
+def product_root(symbol):
+    """Futures product code of '/MES' or an exchange symbol like 'MESZ5' / 'M2KH26' -> 'MES' / 'M2K'"""
+    symbol = symbol.lstrip('/')
+    match = _CONTRACT_SYMBOL.match(symbol)
+    return match.group(1) if match else symbol
+
+
+def product_group(symbol):
+    """CME Globex product group ('equity', 'energy', 'metals') of a futures symbol; unknown roots trade equity hours"""
+    root = product_root(symbol)
+    for group, roots in globex_product_groups.items():
+        if root in roots:
+            return group
+    return 'equity'
+
+
+class GlobexSessions:
+    """
+    CME Globex trading sessions of one product group for a range of days, as sorted epoch-second
+    arrays of session opens and closes. The daily maintenance halt and weekends are the gaps
+    between sessions; holidays and early closes come from the group's pandas_market_calendars
+    calendar (globex_calendars). If that calendar is unavailable, the standard weekly hours
+    (Sunday-Thursday 18:00 to the next day's 17:00, time_zone) are used without holidays.
+    """
+
+    def __init__(self, group, first_day, last_day):
+        self.group = group
+        self.first_day = first_day
+        self.last_day = last_day
+        try:
+            self.opens, self.closes = self._from_exchange_calendar(globex_calendars[group], first_day, last_day)
+        except Exception as e:
+            logging.getLogger('GlobexSessions').warning(
+                f"No exchange calendar for Globex {group} ({e}), using standard weekly hours without holidays"
+            )
+            self.opens, self.closes = self._standard_hours(first_day, last_day)
+
+    @staticmethod
+    def _from_exchange_calendar(name, first_day, last_day):
+        schedule = mcal.get_calendar(name).schedule(first_day, last_day)
+        sessions = []
+        breaks = 'break_start' in schedule and 'break_end' in schedule
+        for row in schedule.itertuples():
+            if breaks and not pd.isna(row.break_start):
+                sessions.append((row.market_open, row.break_start))
+                sessions.append((row.break_end, row.market_close))
+            else:
+                sessions.append((row.market_open, row.market_close))
+        sessions.sort()
+        return [start.timestamp() for start, _ in sessions], [end.timestamp() for _, end in sessions]
+
+    @staticmethod
+    def _standard_hours(first_day, last_day):
+        tz = timezone(time_zone)
+        opens, closes = [], []
+        day = first_day
+        while day <= last_day:
+            if day.weekday() in (6, 0, 1, 2, 3):  # sessions open Sunday through Thursday evening
+                next_day = day + timedelta(days=1)
+                opens.append(tz.localize(datetime(day.year, day.month, day.day, 18)).timestamp())
+                closes.append(tz.localize(datetime(next_day.year, next_day.month, next_day.day, 17)).timestamp())
+            day += timedelta(days=1)
+        return opens, closes
+
+    def covers(self, day):
+        return self.first_day <= day <= self.last_day
+
+    def _session_index(self, ts):
+        return bisect.bisect_right(self.opens, ts) - 1
+
+    def is_open(self, ts):
+        i = self._session_index(ts)
+        return i >= 0 and ts < self.closes[i]
+
+    def seconds_until_open(self, ts):
+        """0 while a session is open, else seconds until the next one opens (None past the end of the range)"""
+        i = self._session_index(ts)
+        if i >= 0 and ts < self.closes[i]:
+            return 0
+        if i + 1 < len(self.opens):
+            return self.opens[i + 1] - ts
+        return None
+
+    def seconds_until_close(self, ts):
+        """Seconds until the open session closes, 0 when closed"""
+        i = self._session_index(ts)
+        if i >= 0 and ts < self.closes[i]:
+            return self.closes[i] - ts
+        return 0
+
+
+_globex = {}  # product group -> GlobexSessions
+
+
+def globex_sessions(symbol, day=None):
+    """GlobexSessions for the symbol's product group, rebuilt for the surrounding years when day falls outside it"""
+    group = product_group(symbol)
+    if day is None:
+        day = datetime.now(tz=timezone(time_zone)).date()
+    sessions = _globex.get(group)
+    if sessions is not None and sessions.covers(day):
+        return sessions
+    with _calendar_lock:
+        sessions = _globex.get(group)
+        if sessions is None or not sessions.covers(day):
+            sessions = _globex[group] = GlobexSessions(group, date(day.year - 1, 12, 24), date(day.year + 1, 12, 31))
+        return sessions
@@ -0,0 +1,274 @@
+import logging
+import os
+import re
+import select
+import selectors
+import socket
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from config import bar_shm_poll_interval, bar_shm_slot_size, bar_shm_slots, bar_shm_socket
+
+# Ring header: magic, layout version, slot count, slot size, creation time (ns), bars written so far.
+# write_count sits on its own 8-byte aligned word so the writer publishes it with one store.
+_HEADER = struct.Struct('<4sIIIqQ')
+_MAGIC = b'TBAR'
+_VERSION = 1
+_WRITE_COUNT = struct.Struct('<Q')
+_WRITE_COUNT_OFFSET = _HEADER.size - _WRITE_COUNT.size
+# Slot header: seqlock stamp (2n + 1 while bar n is being written, 2n + 2 once it is complete), payload length
+_SLOT = struct.Struct('<QI4x')
+
+
+def shm_name(series):
+    """Shared memory segment of a "symbol:timeframe" series, e.g. tim_bars_ESZ5_50t"""
+    return "tim_bars_" + re.sub(r'[^A-Za-z0-9]', '_', series)
+
+
+class ShmRingWriter:
+    """
+    Single-writer ring of encoded bars in a named shared memory segment.
+
+    Bar n goes to slot n % slots. The slot's stamp is made odd before the payload is copied
+    and even (2n + 2) after, then the header's write_count is advanced, so a reader that sees
+    write_count > n and the same even stamp before and after its copy has read bar n intact.
+    This relies on stores reaching memory in program order, which holds on x86 (TSO).
+    """
+
+    def __init__(self, series, slots=bar_shm_slots, slot_size=bar_shm_slot_size):
+        self.name = shm_name(series)
+        self.slots = slots
+        self.slot_size = slot_size
+        size = _HEADER.size + slots * slot_size
+        try:
+            self.shm = SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a producer that did not shut down cleanly
+            stale = SharedMemory(name=self.name)
+            stale.close()
+            stale.unlink()
+            self.shm = SharedMemory(name=self.name, create=True, size=size)
+        self.buf = self.shm.buf
+        # The magic goes in last: readers treat a segment without it as not created yet
+        _HEADER.pack_into(self.buf, 0, bytes(4), _VERSION, slots, slot_size, time.time_ns(), 0)
+        self.buf[:4] = _MAGIC
+        self.write_count = 0
+
+    def write(self, message):
+        if len(message) > self.slot_size - _SLOT.size:
+            raise ValueError(f"Bar of {len(message)} bytes does not fit a {self.slot_size}-byte ring slot")
+        n = self.write_count
+        offset = _HEADER.size + (n % self.slots) * self.slot_size
+        _SLOT.pack_into(self.buf, offset, 2 * n + 1, 0)
+        self.buf[offset + _SLOT.size:offset + _SLOT.size + len(message)] = message
+        _SLOT.pack_into(self.buf, offset, 2 * n + 2, len(message))
+        self.write_count = n + 1
+        _WRITE_COUNT.pack_into(self.buf, _WRITE_COUNT_OFFSET, self.write_count)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ShmRingReader:
+    """
+    One reader's cursor on a ShmRingWriter segment; any number of readers can follow the same ring.
+
+    A new reader starts at the next bar written, or with from_start at the oldest bar still in
+    the ring. If it falls more than a ring behind, the bars that were overwritten are skipped
+    and counted in overruns; the consumer's sequence check fetches them from the bars_history ZSET.
+    """
+
+    def __init__(self, series, from_start=False):
+        self.series = series
+        self.shm = _attach(shm_name(series))
+        self.buf = self.shm.buf
+        magic, version, self.slots, self.slot_size, self.created_ns, write_count = _HEADER.unpack_from(self.buf)
+        if magic == bytes(4):
+            self.close()
+            raise FileNotFoundError(f"{shm_name(series)} is still being created")
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError(f"{shm_name(series)} is not a version {_VERSION} bar ring")
+        self.next_index = max(write_count - self.slots, 0) if from_start else write_count
+        self.overruns = 0
+
+    def read(self):
+        """Return the bars written since the last call, oldest first"""
+        write_count = _WRITE_COUNT.unpack_from(self.buf, _WRITE_COUNT_OFFSET)[0]
+        messages = []
+        while self.next_index < write_count:
+            n = max(self.next_index, write_count - self.slots)
+            self.overruns += n - self.next_index
+            offset = _HEADER.size + (n % self.slots) * self.slot_size
+            stamp, length = _SLOT.unpack_from(self.buf, offset)
+            message = bytes(self.buf[offset + _SLOT.size:offset + _SLOT.size + length])
+            if stamp != 2 * n + 2 or _SLOT.unpack_from(self.buf, offset)[0] != stamp:
+                # Overwritten by the writer lapping this reader; move on to what is still in the ring
+                self.next_index = n + 1
+                self.overruns += 1
+                write_count = _WRITE_COUNT.unpack_from(self.buf, _WRITE_COUNT_OFFSET)[0]
+                continue
+            messages.append(message)
+            self.next_index = n + 1
+        return messages
+
+    def is_stale(self):
+        """True when the segment has been replaced by a restarted producer (or removed)"""
+        try:
+            shm = _attach(self.shm.name)
+        except FileNotFoundError:
+            return True
+        try:
+            return _HEADER.unpack_from(shm.buf)[4] != self.created_ns
+        finally:
+            shm.close()
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+def _attach(name):
+    """Open an existing segment without letting this process's resource tracker unlink it on exit"""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class ShmWakeupServer:
+    """
+    Producer side of the bar wakeup: readers connect to a unix socket and pass an eventfd
+    (SCM_RIGHTS); notify() bumps every registered eventfd after a bar is written. A reader
+    is dropped when its connection closes.
+    """
+
+    def __init__(self, path=bar_shm_socket):
+        self.path = path
+        self.eventfds = {}  # connection -> eventfd received over it
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger('ShmWakeupServer')
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ)
+        self.closed = False
+        self.thread = threading.Thread(target=self._serve, name='shm-wakeup', daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while not self.closed:
+            for key, _ in self.selector.select(timeout=1):
+                if key.fileobj is self.server:
+                    conn, _ = self.server.accept()
+                    self.selector.register(conn, selectors.EVENT_READ)
+                    continue
+                conn = key.fileobj
+                try:
+                    _, fds, _, _ = socket.recv_fds(conn, 16, 1)
+                except OSError:
+                    fds = None
+                if fds:
+                    with self.lock:
+                        self.eventfds[conn] = fds[0]
+                    self.logger.info(f"Bar reader registered for wakeups ({len(self.eventfds)} total)")
+                else:
+                    self._drop(conn)
+
+    def _drop(self, conn):
+        self.selector.unregister(conn)
+        with self.lock:
+            fd = self.eventfds.pop(conn, None)
+        if fd is not None:
+            os.close(fd)
+        conn.close()
+
+    def notify(self):
+        with self.lock:
+            for fd in self.eventfds.values():
+                try:
+                    os.eventfd_write(fd, 1)
+                except OSError:
+                    pass  # counter saturated by a reader that stopped reading; its connection drop cleans up
+
+    def close(self):
+        self.closed = True
+        self.thread.join(timeout=2)
+        for key in list(self.selector.get_map().values()):
+            if key.fileobj is not self.server:
+                self._drop(key.fileobj)
+        self.selector.close()
+        self.server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class ShmWakeupClient:
+    """
+    Reader side of the bar wakeup. wait(timeout) returns once the producer has written a bar
+    or the timeout expires. Without eventfd (non-Linux) or without a producer to register
+    with, it falls back to sleeping poll_interval between ring scans, retrying registration
+    each time it would otherwise return on timeout.
+    """
+
+    def __init__(self, path=bar_shm_socket, poll_interval=bar_shm_poll_interval):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.eventfd = None
+        self.conn = None
+        self.last_connect = 0
+        self.logger = logging.getLogger('ShmWakeupClient')
+        self.connect()
+
+    def connect(self):
+        self.last_connect = time.monotonic()
+        if not hasattr(os, 'eventfd'):
+            return False
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self.path)
+        except OSError:
+            conn.close()
+            return False
+        self.eventfd = os.eventfd(0, os.EFD_NONBLOCK)
+        socket.send_fds(conn, [b'w'], [self.eventfd])
+        self.conn = conn
+        self.logger.info(f"Registered for bar wakeups on {self.path}")
+        return True
+
+    def disconnect(self):
+        if self.conn is not None:
+            self.conn.close()
+            os.close(self.eventfd)
+            self.conn = self.eventfd = None
+
+    def wait(self, timeout):
+        """Block until woken or timeout seconds pass; returns False on timeout"""
+        if self.conn is None:
+            time.sleep(self.poll_interval)
+            if time.monotonic() - self.last_connect < timeout:
+                return True
+            return self.connect()
+        ready = select.select([self.eventfd, self.conn], [], [], timeout)[0]
+        if self.conn in ready:
+            # The producer only closes our connection when it exits
+            self.logger.warning("Producer closed the wakeup socket, falling back to polling")
+            self.disconnect()
+            return True
+        if not ready:
+            return False
+        try:
+            os.eventfd_read(self.eventfd)
+        except BlockingIOError:
+            pass
+        return True
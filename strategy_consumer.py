@@ -1,16 +1,23 @@
+import asyncio
 import threading
 import json
 import redis
 import pandas as pd
-from time import sleep
+from time import sleep, time_ns
 import logging
 from collections import defaultdict
 from config import *
 from utils import *
-from schwab import historical_data, place_order
+from schwab import historical_data
 import pandas_ta as ta
-from tastytrade import place_tastytrade_order
-from utils import is_tick_timeframe, get_active_exchange_symbol
+from order_dispatcher import OrderDispatcher, OrderIntent, read_positions
+from latency import LatencyRecorder, CONSUMER_STAGES
+from bar_transport import make_bar_transport
+from bar_codec import decode_bar, decode_bar_columns, OHLCV
+from bar_history import BarRingBuffer
+from indicators import IndicatorEngine
+from strategy_scheduler import StrategyScheduler
+from utils import bar_timeframe_error, bar_timeframe_key, is_tick_timeframe, get_active_exchange_symbol
 from datetime import datetime,timedelta,timezone
 import logging
 import sys
@@ -26,32 +33,117 @@ logging.basicConfig(
 class StrategyConsumer:
     def __init__(self, redis_host='localhost', redis_port=6379, redis_db=0):
         self.redis_client = redis.Redis(host=redis_host, port=redis_port, db=redis_db)
-        self.pubsub = self.redis_client.pubsub()
+        self.transport = make_bar_transport(self.redis_client)  # pub/sub or Streams, see config.bar_transport
         self.logger = logging.getLogger('StrategyConsumer')
         # Remove self.tick_dataframes - use Redis only for tick data
-        self.pending_strategies = defaultdict(threading.Event)  # For triggering strategy on new bars
+        self.scheduler = None  # StrategyScheduler, runs the strategies; set up in run()
+        self.latest_bars = {}  # ticker -> last bar message received, with its pipeline timestamps
+        self.latency = LatencyRecorder('consumer')
+        # "symbol:timeframe" -> BarRingBuffer, seeded from the bars_history ZSET and appended from each message
+        self.bar_windows = {}
+        self.window_seqs = {}  # "symbol:timeframe" -> seq of the newest bar in its window
+        self.window_lock = threading.RLock()
+        self.indicator_engines = {}  # "symbol:timeframe" -> IndicatorEngine, with config.streaming_indicators
+        self.order_dispatcher = OrderDispatcher()  # places orders off the strategy threads, records fills
         
 
-    def get_tick_dataframe(self, symbol, period1: int = 7, period2: int = 30):
-        zset_key = f"bars_history:{symbol}"
-        max_bars = max(period1, period2)
+    def get_tick_dataframe(self, symbol, timeframe, period1: int = 7, period2: int = 30):
+        series = f"{symbol}:{timeframe}"
+        n_bars = max(period1, period2) + 1
 
-        # Fetch latest bars by rank (newest to oldest), then reverse for oldest → newest
-        latest_bars = self.redis_client.zrevrange(zset_key, 0, max_bars)
-        bars = [json.loads(bar.decode('utf-8')) for bar in reversed(latest_bars)]
+        window = self.bar_windows.get(series)
+        if window is None or window.capacity < n_bars or len(window) < n_bars:
+            # Cold start, a larger period than the window was sized for, or too few bars yet
+            window = self.seed_bar_window(series, n_bars)
 
-        if not bars:
-            return pd.DataFrame()
-
-        df = pd.DataFrame(bars)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df.set_index('timestamp', inplace=True)
-        df.sort_index(inplace=True)
+        with self.window_lock:
+            if not len(window):
+                return pd.DataFrame()
+            bars = window.last(n_bars)
+            df = pd.DataFrame({name: bars[name].copy() for name in OHLCV},
+                              index=pd.to_datetime(bars['timestamp'], unit='ns'))
+        df.index.name = 'timestamp'
 
         return df
-    
+
+    def get_trend_values(self, series, specs):
+        """
+        (previous, last) value of each (kind, length) trend over a series' bar window, from its
+        IndicatorEngine: only bars added since the last call are fed to the indicators.
+        """
+        n_bars = max(length for _, length in specs) + 1
+
+        window = self.bar_windows.get(series)
+        if window is None or window.capacity < n_bars or len(window) < n_bars:
+            window = self.seed_bar_window(series, n_bars)
+
+        with self.window_lock:
+            bars = window.last(len(window))
+            engine = self.indicator_engines.setdefault(series, IndicatorEngine())
+            return engine.sync(bars['timestamp'], bars['close'], specs)
+
+    def seed_bar_window(self, series, min_bars=0):
+        """(Re)build a series' rolling window from its bars_history ZSET"""
+        with self.window_lock:
+            members = self.redis_client.zrange(f"bars_history:{series}", 0, -1)
+            columns = decode_bar_columns(members)
+            seqs = columns.pop('seq')
+            window = self.bar_windows.get(series)
+            needed = max(min_bars, len(members))
+            if window is None or window.capacity < needed:
+                window = self.bar_windows[series] = BarRingBuffer(needed + tick_bar_history_padding)
+            window.clear()
+            window.extend(**columns)
+            self.window_seqs[series] = seqs[-1] if seqs else 0
+        self.logger.info(f"Seeded bar window for {series} with {len(members)} bars")
+        return window
+
+    def append_bar(self, series, bar):
+        """
+        Add a received bar to its window; returns False for a bar the window already has.
+        Bars are numbered per series, so a jump in seq means bars were missed (dropped pub/sub
+        message, consumer stall): only those are fetched from the ZSET by score, and the window
+        is reseeded only when they have already been trimmed away.
+        """
+        seq = bar['seq']
+        with self.window_lock:
+            window = self.bar_windows.get(series)
+            if window is None:
+                return True  # not seeded yet; the first strategy run seeds it, this bar included
+            last_seq = self.window_seqs[series]
+            if seq <= last_seq:
+                return False
+
+            if seq > last_seq + 1:
+                members = self.redis_client.zrangebyscore(f"bars_history:{series}", last_seq + 1, seq - 1)
+                if len(members) != seq - last_seq - 1:
+                    self.logger.warning(f"Bars {last_seq + 1}-{seq - 1} of {series} are gone from Redis, reseeding")
+                    window = self.seed_bar_window(series, window.capacity - tick_bar_history_padding)
+                    # Pub/sub and Streams send the bar after its ZSET write, so the seed has it; the
+                    # shm ring delivers it before, so it may not be in the ZSET yet
+                    if seq > self.window_seqs[series]:
+                        last_ts = window.last_timestamp()
+                        if last_ts is None or bar['timestamp'] > last_ts:
+                            window.append(bar['timestamp'], *(bar[name] for name in OHLCV))
+                        self.window_seqs[series] = seq
+                    return True
+                missed = decode_bar_columns(members)
+                last_ts = window.last_timestamp()
+                for i, timestamp in enumerate(missed['timestamp']):
+                    # A producer warmup renumbers bars the window may already hold
+                    if last_ts is None or timestamp > last_ts:
+                        window.append(timestamp, *(missed[name][i] for name in OHLCV))
+                self.logger.info(f"Filled {len(members)} missed bars ({last_seq + 1}-{seq - 1}) of {series}")
+
+            window.append(bar['timestamp'], *(bar[name] for name in OHLCV))
+            self.window_seqs[series] = seq
+            return True
+
     def strategy(self, ticker, logger, triggered_by_new_bar=False):
         """Modified strategy function with new bar trigger logic"""
+        bar_timings = self.latest_bars.pop(ticker, None) if triggered_by_new_bar else None
+        if bar_timings is not None:
+            bar_timings['ts_strategy'] = time_ns()
         try:
             [time_frame, schwab_qty, trade_flag, period1, trend_line1, period2, trend_line2, tasty_qty] = (
                 get_strategy_prarams(ticker, logger)
@@ -70,227 +162,186 @@ class StrategyConsumer:
             schwab_qty = int(schwab_qty)
             tasty_qty = int(tasty_qty)
             trade_file_path = f"trades/{ticker.replace('/', '_')}.json"
-            
-            if not os.path.exists(trade_file_path):
-                with open(trade_file_path, "w") as f:
-                    json.dump({}, f)
-
-            with open(trade_file_path, "r") as file:
-                trades = json.load(file)
+            trades = read_positions(trade_file_path)  # shared with the order dispatcher's fill updates
                 
             # Get data based on timeframe type
             ticker = f"{get_active_exchange_symbol(ticker).lstrip('/')}" if ticker.startswith("/") else ticker
 
-            if is_tick_timeframe(time_frame):
+            if is_tick_timeframe(time_frame) and streaming_indicators:
+                # Incremental trends over the bar window, no DataFrame (see indicators.py)
+                specs = ((trend_line1, int(period1)), (trend_line2, int(period2)))
+                trends = self.get_trend_values(f"{ticker}:{bar_timeframe_key(time_frame)}", specs)
+                trend1, trend2 = trends[specs[0]], trends[specs[1]]
+            else:
+                if is_tick_timeframe(time_frame):
 
-                logger.info(f"Using tick data for {ticker}")
-                
-                df = self.get_tick_dataframe(ticker, int(period1), int(period2))  # This returns DataFrame and updated number of bars needed for each period
-                
-                if df is None:
-                    logger.warning(f"No tick data available for {ticker}")
+                    logger.info(f"Using tick data for {ticker}")
+
+                    df = self.get_tick_dataframe(ticker, bar_timeframe_key(time_frame), int(period1), int(period2))  # This returns DataFrame and updated number of bars needed for each period
+
+                    if df is None:
+                        logger.warning(f"No tick data available for {ticker}")
+                        return
+                else:
+                    logger.info(f"Using historical data for {ticker}")
+                    df = historical_data(ticker, time_frame, logger=logger)
+
+                if df is None or len(df) < max(int(period1), int(period2)):
+                    logger.warning(f"Insufficient data for {ticker}")
                     return
-            else:
-                logger.info(f"Using historical data for {ticker}")
-                df = historical_data(ticker, time_frame, logger=logger)
 
-            if df is None or len(df) < max(int(period1), int(period2)):
-                logger.warning(f"Insufficient data for {ticker}")
-                return
-            
-            # Calculate trend indicators
-            if trend_line1 == "EMA":
-                df["trend1"] = ta.ema(df["close"], length=int(period1))
-            elif trend_line1 == "SMA":
-                df["trend1"] = ta.sma(df["close"], length=int(period1))
-            elif trend_line1 == "WilderSmoother":
-                df["trend1"] = wilders_smoothing(df, length=int(period1))
-
-            if trend_line2 == "EMA":
-                df["trend2"] = ta.ema(df["close"], length=int(period2))
-            elif trend_line2 == "SMA":
-                df["trend2"] = ta.sma(df["close"], length=int(period2))
-            elif trend_line2 == "WilderSmoother":
-                df["trend2"] = wilders_smoothing(df, length=int(period2))
+                # Calculate trend indicators
+                if trend_line1 == "EMA":
+                    df["trend1"] = ta.ema(df["close"], length=int(period1))
+                elif trend_line1 == "SMA":
+                    df["trend1"] = ta.sma(df["close"], length=int(period1))
+                elif trend_line1 == "WilderSmoother":
+                    df["trend1"] = wilders_smoothing(df, length=int(period1))
+
+                if trend_line2 == "EMA":
+                    df["trend2"] = ta.ema(df["close"], length=int(period2))
+                elif trend_line2 == "SMA":
+                    df["trend2"] = ta.sma(df["close"], length=int(period2))
+                elif trend_line2 == "WilderSmoother":
+                    df["trend2"] = wilders_smoothing(df, length=int(period2))
+
+                # (previous, last) value of each trend
+                trend1 = tuple(df["trend1"].iloc[-2:])
+                trend2 = tuple(df["trend2"].iloc[-2:])
 
             # Check for NaN values
-            if (df["trend1"].isna().iloc[-1] or df["trend2"].isna().iloc[-1] or 
-                df["trend1"].isna().iloc[-2] or df["trend2"].isna().iloc[-2]):
+            if any(pd.isna(value) for value in trend1 + trend2):
                 logger.warning(f"NaN values in trend indicators for {ticker}")
                 return
 
             # Trading logic
             Long_condition = (
-                df.iloc[-1]["trend1"] > df.iloc[-1]["trend2"]
-                and df.iloc[-2]["trend1"] < df.iloc[-2]["trend2"]
+                trend1[1] > trend2[1]
+                and trend1[0] < trend2[0]
             )
             Short_condition = (
-                df.iloc[-1]["trend1"] < df.iloc[-1]["trend2"]
-                and df.iloc[-2]["trend1"] > df.iloc[-2]["trend2"]
+                trend1[1] < trend2[1]
+                and trend1[0] > trend2[0]
             )
-            # Execute trades
+            # Execute trades: orders are queued and the position recorded as PENDING until they are placed
             if ticker not in trades.copy():
                 if Long_condition:
                     logger.info(f"Long condition triggered for {ticker}")
-                    # order_id_schwab = place_order(ticker, schwab_qty, "BUY", account_id, logger, "OPENING") if schwab_qty > 0 else 0
-                    order_id_schwab = ""
-                    order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Buy to Open", account_id, logger) if tasty_qty > 0 else 0
-                    trades[ticker] = {"action": "LONG", "order_id_schwab": order_id_schwab, "order_id_tastytrade": order_id_tastytrade}
+                    self._submit_orders(ticker, "LONG", None, tasty_qty, trade_file_path, logger, bar_timings)
                 elif Short_condition:
                     logger.info(f"Short condition triggered for {ticker}")
-                    # order_id_schwab = place_order(ticker, schwab_qty, "SELL_SHORT", account_id, logger, "OPENING") if schwab_qty > 0 else 0
-                    order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Sell to Open", account_id, logger) if tasty_qty > 0 else 0
-                    order_id_schwab = ""
-                    trades[ticker] = {"action": "SHORT", "order_id_schwab": order_id_schwab, "order_id_tastytrade": order_id_tastytrade}
+                    self._submit_orders(ticker, "SHORT", None, tasty_qty, trade_file_path, logger, bar_timings)
             else:
                 # Position reversal logic
                 if trades[ticker]["action"] == "LONG" and Short_condition:
                     logger.info(f"Reversing position for {ticker}: Closing LONG, opening SHORT")
-                    # long_order_id_schwab = place_order(ticker, schwab_qty, "SELL", account_id, logger, "CLOSING") if schwab_qty > 0 else 0
-                    long_order_id_schwab = ""
-                    long_order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Sell to Close", account_id, logger) if tasty_qty > 0 else 0
-                    # short_order_id_schwab = place_order(ticker, schwab_qty, "SELL_SHORT", account_id, logger, "OPENING") if schwab_qty > 0 else 0
-                    short_order_id_schwab = ""
-                    short_order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Sell to Open", account_id, logger) if tasty_qty > 0 else 0
-                    trades[ticker] = {"action": "SHORT", "order_id_schwab": short_order_id_schwab, "order_id_tastytrade": short_order_id_tastytrade}
+                    self._submit_orders(ticker, "SHORT", "LONG", tasty_qty, trade_file_path, logger, bar_timings)
 
                 elif trades[ticker]["action"] == "SHORT" and Long_condition:
                     logger.info(f"Reversing position for {ticker}: Closing SHORT, opening LONG")
-                    # short_order_id_schwab = place_order(ticker, schwab_qty, "BUY_TO_COVER", account_id, logger, "CLOSING") if schwab_qty > 0 else 0
-                    short_order_id_schwab = ""
-                    short_order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Buy to Close", account_id, logger) if tasty_qty > 0 else 0
-                    # long_order_id_schwab = place_order(ticker, schwab_qty, "BUY", account_id, logger, "OPENING") if schwab_qty > 0 else 0
-                    long_order_id_schwab = ""
-                    long_order_id_tastytrade = place_tastytrade_order(ticker, tasty_qty, "Buy to Open", account_id, logger) if tasty_qty > 0 else 0
-                    trades[ticker] = {"action": "LONG", "order_id_schwab": long_order_id_schwab, "order_id_tastytrade": long_order_id_tastytrade}
-
-            with open(trade_file_path, "w") as file:
-                json.dump(trades.copy(), file)
+                    self._submit_orders(ticker, "LONG", "SHORT", tasty_qty, trade_file_path, logger, bar_timings)
 
             logger.info(f"Strategy for {ticker} completed.")
 
         except Exception as e:
             logger.error(f"Error in strategy for {ticker}: {e}", exc_info=True)
-
-    def subscribe_to_tick_bars(self, symbols):
-        """Subscribe to tick bar updates for given symbols"""
-        for symbol in symbols:
-            channel = f"tick_bars:{symbol}" 
-            self.pubsub.subscribe(channel)
-        
-        self.logger.info(f"Subscribed to tick bars for symbols: {symbols}")
-
-    def listen_for_tick_bars(self, tick_symbols_to_tickers):
+        finally:
+            if bar_timings is not None:
+                self.latency.record_stages(
+                    f"{bar_timings['symbol']}:{bar_timings['timeframe']}", bar_timings, CONSUMER_STAGES
+                )
+
+    def _submit_orders(self, ticker, position, close_position, tasty_qty, trade_file_path, logger, bar_timings):
+        """Hand the orders to the dispatcher; Schwab orders are off for the consumer, so only Tastytrade trades"""
+        self._stamp_order_submit(bar_timings)
+        self.order_dispatcher.submit(
+            OrderIntent(ticker, position, close_position, {"tastytrade": tasty_qty}, trade_file_path, logger)
+        )
+
+    def _stamp_order_submit(self, bar_timings):
+        """Mark when the orders for this bar are handed to the order dispatcher"""
+        if bar_timings is not None and 'ts_order' not in bar_timings:
+            bar_timings['ts_order'] = time_ns()
+
+    def report_latency(self):
+        """Periodically dump the consumer latency histograms (logs/latency_consumer.json, latency:consumer)"""
+        while True:
+            sleep(latency_report_interval)
+            self.latency.report(self.redis_client)
+
+    def subscribe_to_tick_bars(self, series):
+        """Subscribe to bar updates for each "symbol:timeframe" series"""
+        self.transport.subscribe(series)
+        self.logger.info(f"Subscribed to tick bars over {self.transport.name} for: {series}")
+
+    def listen_for_tick_bars(self, tick_series_to_tickers):
         """Listen for new tick bars and trigger strategies"""
-        for message in self.pubsub.listen():
-            if message['type'] == 'message':
+        for batch in self.transport.listen():
+            ts_receive = time_ns()
+            # A Streams catch-up read can hold several bars per series; strategies run once on the latest
+            for series, data in batch:
                 try:
-                    # Parse the channel to get symbol
-                    channel = message['channel'].decode('utf-8')
-                    symbol = channel.split(':')[1]
                     # Parse bar data
-                    bar_data = json.loads(message['data'].decode('utf-8'))
-                    self.logger.info(f"Received new bar for {symbol}: close={bar_data['close']}")
+                    bar_data = decode_bar(data)
+                    bar_data['ts_receive'] = ts_receive
+                    if not self.append_bar(series, bar_data):
+                        self.logger.debug(f"Skipping bar for {series} already in its window")
+                        continue
+                    self.logger.info(f"Received new bar for {series}: close={bar_data['close']}")
                     
-                    # Trigger strategy for all tickers using this symbol
-                    if symbol in tick_symbols_to_tickers:
-                        for ticker in tick_symbols_to_tickers[symbol]:
-                            self.pending_strategies[ticker].set()
+                    # Trigger strategy for all tickers using this contract and bar size
+                    if series in tick_series_to_tickers:
+                        for ticker in tick_series_to_tickers[series]:
+                            self.latest_bars[ticker] = dict(bar_data)
+                            self.scheduler.notify_bar(ticker)
                             self.logger.debug(f"Triggered strategy event for {ticker}")
                     
                 except Exception as e:
                     self.logger.error(f"Error processing tick bar message: {e}")
 
-    def main_strategy_loop(self, ticker):
-        """Main strategy loop for a specific ticker"""
-        logger = configure_logger(ticker)
-        logger.info(f"MAIN STRATEGY STARTED for {ticker}")
-
-        try:
-            while True:
-                while is_within_time_range():
-                    _, today_date = get_current_datetime()
-                    time_frame, *_ = get_strategy_prarams(ticker, logger)
-
-                    if ticker.startswith("/"):  # Futures
-                        if is_holiday(today_date):
-                            logger.info("Market closed due to holiday")
-                            sleep(60)
-                            continue
-                        run_strategy = True
-
-                    else:  # Stocks
-                        market_hours, status = get_market_hours(today_date)
-                        if not market_hours:
-                            logger.info(status)
-                            sleep(60)
-                            continue
-                        current_time, _ = get_current_datetime()
-                        if not (market_hours[0] <= current_time <= market_hours[1]):
-                            if current_time >= market_hours[1]:
-                                logger.info("Market closed")
-                                break
-                            else:
-                                sleep(60)
-                                continue
-                        run_strategy = True
-
-                    if run_strategy:
-                        if is_tick_timeframe(time_frame):
-                            if self.pending_strategies[ticker].wait(timeout=300):
-                                self.pending_strategies[ticker].clear()
-                                self.strategy(ticker, logger, triggered_by_new_bar=True)
-                            else:
-                                logger.debug(f"No new bar received for {ticker} in 5 minutes")
-                        else:
-                            sleep_until_next_interval(ticker, time_frame)
-                            self.strategy(ticker, logger)
-
-                sleep(10)  # Short pause before rechecking time range
-
-        except Exception as e:
-            logger.error(f"Error in main loop for {ticker}: {e}", exc_info=True)
-
-
     def run(self, tickers_config):
         """Main run method for strategy consumer"""
         # Map symbols to tickers for reverse lookup
         self.logger.info("Startingg Strategy Consumer...")
-        tick_symbols_to_tickers = defaultdict(list)
-        tick_symbols = []
+        tick_series_to_tickers = defaultdict(list)
+        tick_series = []
+        series_bars = {}  # series -> bars the largest strategy period on it needs
         
         for ticker, config in tickers_config.items():
             time_frame = config[0]
-            if is_tick_timeframe(time_frame):
+            error = bar_timeframe_error(time_frame)
+            if error:
+                self.logger.error(f"Not subscribing to bars for {ticker}: {error}")
+            elif is_tick_timeframe(time_frame):
                 ticker_for_data = get_active_exchange_symbol(ticker) if ticker.startswith("/") else ticker
-                tick_symbols.append(ticker_for_data)
-                tick_symbols_to_tickers[ticker_for_data].append(ticker)
+                series = f"{ticker_for_data}:{bar_timeframe_key(time_frame)}"
+                if series not in tick_series_to_tickers:
+                    tick_series.append(series)
+                tick_series_to_tickers[series].append(ticker)
+                series_bars[series] = max(series_bars.get(series, 0), int(config[3]) + 1, int(config[5]) + 1)
         
+        self.scheduler = StrategyScheduler(self, tickers_config.keys())
+
         # Subscribe to tick bars if needed
-        if tick_symbols:
-            self.subscribe_to_tick_bars(tick_symbols)
+        if tick_series:
+            self.subscribe_to_tick_bars(tick_series)
+            # Seeded after subscribing, so a bar published in between is in the ZSET or the subscription
+            for series in tick_series:
+                self.seed_bar_window(series, series_bars[series])
             
             # Start tick bar listener in separate thread
             listener_thread = threading.Thread(
                 target=self.listen_for_tick_bars, 
-                args=(tick_symbols_to_tickers,), 
+                args=(tick_series_to_tickers,), 
                 daemon=True
             )
             listener_thread.start()
+
+            threading.Thread(target=self.report_latency, daemon=True).start()
         
-        # Start strategy threads for each ticker
-        threads = []
-        for ticker in tickers_config.keys():
-            ticker_for_data = get_active_exchange_symbol(ticker) if ticker.startswith("/") else ticker
-
-            thread = threading.Thread(target=self.main_strategy_loop, args=(ticker,), daemon=True)
-            threads.append(thread)
-            thread.start()
-        
-        # Keep main thread alive
+        # All strategies run from one event loop; bars from the listener thread wake tick strategies
         try:
-            for thread in threads:
-                thread.join()
+            asyncio.run(self.scheduler.run())
         except KeyboardInterrupt:
             print("Shutting down strategy consumer...")
 
@@ -0,0 +1,204 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import globex_max_sleep_seconds, session_check_workers, strategy_workers, tick_strategy_recheck_seconds
+from param_store import strategy_param_store
+from session_calendar import globex_sessions
+from utils import (bar_timeframe_error, configure_logger, get_current_datetime, get_market_hours, get_strategy_prarams,
+                   is_tick_timeframe, is_within_time_range, next_interval_time)
+
+
+class StrategyScheduler:
+    """
+    Runs every ticker's strategy from one asyncio loop instead of a thread per ticker.
+
+    Each ticker has at most one pending timer in a heap ordered by wall-clock wake time. A
+    planning step checks the ticker's trading session and parameters, then either sets a timer
+    to check again (closed), a timer for the next interval start (time-based strategies) or
+    arms the ticker for bar triggers with a timer to re-plan (tick strategies, so a changed time
+    frame or a session close is picked up). Bars from the listener thread arrive through
+    notify_bar(); a bar for a ticker whose strategy is still running queues one more run. A
+    change to a ticker's row in tickers.json re-plans it right away.
+
+    Strategy runs (bar data, broker and HTTP calls) go to a strategy_workers thread pool and the
+    session / parameter checks to a separate session_check_workers pool, so slow broker calls
+    cannot hold up the scheduling of other tickers.
+    """
+
+    def __init__(self, consumer, tickers):
+        self.consumer = consumer
+        self.tickers = list(tickers)
+        self.loggers = {}
+        self.timers = []  # heap of (wake time, tiebreak, ticker, version, callback)
+        self.timer_versions = dict.fromkeys(self.tickers, 0)  # a newer timer for a ticker cancels the older one
+        self.counter = itertools.count()
+        self.timers_changed = None
+        self.bar_driven = set()  # tick strategies currently waiting for bars
+        self.running = set()
+        self.rerun = set()  # bar arrived while the ticker's strategy was running
+        self.loop = None
+        self.strategy_executor = ThreadPoolExecutor(strategy_workers, thread_name_prefix='strategy')
+        self.session_executor = ThreadPoolExecutor(session_check_workers, thread_name_prefix='session-check')
+        self.logger = logging.getLogger('StrategyScheduler')
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.timers_changed = asyncio.Event()
+        for ticker in self.tickers:
+            self.loggers[ticker] = configure_logger(ticker)
+            self.loggers[ticker].info(f"MAIN STRATEGY STARTED for {ticker}")
+            self._set_timer(ticker, time.time(), self._plan)
+        strategy_param_store().on_change(self._params_changed)
+        self.logger.info(f"Scheduling strategies for {len(self.tickers)} tickers")
+        try:
+            await self._timer_loop()
+        finally:
+            self.strategy_executor.shutdown(wait=False, cancel_futures=True)
+            self.session_executor.shutdown(wait=False, cancel_futures=True)
+
+    def notify_bar(self, ticker):
+        """Thread-safe: a new bar for a tick strategy's series"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._on_bar, ticker)
+
+    def _params_changed(self, old, new):
+        """ParamStore callback (watcher thread): re-plan tickers whose parameters changed, e.g. a new time frame"""
+        changed = [ticker for ticker in self.tickers if old.get(ticker) != new.get(ticker)]
+        if changed and self.loop is not None:
+            self.loop.call_soon_threadsafe(self._replan, changed)
+
+    def _replan(self, tickers):
+        for ticker in tickers:
+            self.loggers[ticker].info(f"Strategy params changed for {ticker}: {strategy_param_store().get(ticker)}")
+            self._set_timer(ticker, time.time(), self._plan)
+
+    def _set_timer(self, ticker, wake_time, callback):
+        self.timer_versions[ticker] += 1
+        heapq.heappush(self.timers, (wake_time, next(self.counter), ticker, self.timer_versions[ticker], callback))
+        self.timers_changed.set()
+
+    async def _timer_loop(self):
+        while True:
+            now = time.time()
+            while self.timers and self.timers[0][0] <= now:
+                _, _, ticker, version, callback = heapq.heappop(self.timers)
+                if version == self.timer_versions[ticker]:
+                    self.loop.create_task(self._guarded(ticker, callback))
+            self.timers_changed.clear()
+            timeout = self.timers[0][0] - now if self.timers else None
+            try:
+                await asyncio.wait_for(self.timers_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _guarded(self, ticker, callback):
+        try:
+            await callback(ticker)
+        except Exception as e:
+            self.loggers[ticker].error(f"Error in scheduling for {ticker}: {e}", exc_info=True)
+            self.bar_driven.discard(ticker)
+            self._set_timer(ticker, time.time() + 60, self._plan)
+
+    def session_delay(self, ticker):
+        """
+        Seconds until the ticker's session should be checked again, 0 while it is open, and the
+        ticker's time frame (None for stocks outside the weekly trading window). Futures follow
+        their product group's Globex sessions. Blocking: calendar and file reads.
+        """
+        logger = self.loggers[ticker]
+        if ticker.startswith("/"):  # Futures: CME Globex sessions, halts and early closes included
+            time_frame, *_ = get_strategy_prarams(ticker, logger)
+            delay = globex_sessions(ticker).seconds_until_open(time.time())
+            if delay is None:
+                logger.warning(f"No upcoming Globex session known for {ticker}, checking again later")
+                return globex_max_sleep_seconds, time_frame
+            if delay:
+                logger.info(f"Globex closed for {ticker}, next open in {delay / 60:.0f} min")
+                return min(delay, globex_max_sleep_seconds), time_frame
+            return 0, time_frame
+
+        if not is_within_time_range():
+            return 10, None
+        _, today_date = get_current_datetime()
+        time_frame, *_ = get_strategy_prarams(ticker, logger)
+
+        # Stocks
+        market_hours, status = get_market_hours(today_date)
+        if not market_hours:
+            logger.info(status)
+            return 60, time_frame
+        current_time, _ = get_current_datetime()
+        if current_time > market_hours[1]:
+            logger.info("Market closed")
+            return 10, time_frame
+        if current_time < market_hours[0]:
+            return 60, time_frame
+        return 0, time_frame
+
+    async def _plan(self, ticker):
+        delay, time_frame = await self.loop.run_in_executor(self.session_executor, self.session_delay, ticker)
+        error = bar_timeframe_error(time_frame)
+        if error:
+            # Skipped until tickers.json is fixed; a change to the row re-plans it right away
+            self.loggers[ticker].error(f"Not scheduling {ticker}: {error}")
+            self.bar_driven.discard(ticker)
+            self._set_timer(ticker, time.time() + tick_strategy_recheck_seconds, self._plan)
+        elif delay:
+            self.bar_driven.discard(ticker)
+            self._set_timer(ticker, time.time() + delay, self._plan)
+        elif is_tick_timeframe(time_frame):
+            self.bar_driven.add(ticker)
+            self._set_timer(ticker, time.time() + tick_strategy_recheck_seconds, self._plan)
+        else:
+            self.bar_driven.discard(ticker)
+            wake_time = next_interval_time(ticker, time_frame).timestamp()
+            if wake_time <= time.time():
+                # No interval left today (e.g. stocks after the last '1h' slot)
+                self._set_timer(ticker, time.time() + 60, self._plan)
+            elif ticker.startswith("/") and not globex_sessions(ticker).is_open(wake_time - 1):
+                # The interval ends in a halt or after the close: nothing to run on, wait for the next open
+                self._set_timer(ticker, wake_time, self._plan)
+            else:
+                self._set_timer(ticker, wake_time, self._run_timed)
+
+    async def _run_timed(self, ticker):
+        self.running.add(ticker)
+        try:
+            await self._run_strategy(ticker, triggered_by_new_bar=False)
+        finally:
+            self.running.discard(ticker)
+        await self._plan(ticker)
+
+    def _on_bar(self, ticker):
+        if ticker not in self.bar_driven:
+            return
+        if ticker in self.running:
+            self.rerun.add(ticker)
+            return
+        self.running.add(ticker)  # before the task starts, so a second bar in this loop pass queues a rerun
+        self.loop.create_task(self._guarded(ticker, self._run_on_bars))
+
+    async def _run_on_bars(self, ticker):
+        """Run the strategy for the latest bar, and again if another arrived meanwhile, while the session is open"""
+        try:
+            while True:
+                self.rerun.discard(ticker)
+                delay, _ = await self.loop.run_in_executor(self.session_executor, self.session_delay, ticker)
+                if delay:
+                    self.bar_driven.discard(ticker)
+                    self._set_timer(ticker, time.time() + delay, self._plan)
+                    return
+                await self._run_strategy(ticker, triggered_by_new_bar=True)
+                if ticker not in self.rerun:
+                    return
+        finally:
+            self.running.discard(ticker)
+
+    async def _run_strategy(self, ticker, triggered_by_new_bar):
+        await self.loop.run_in_executor(
+            self.strategy_executor, self.consumer.strategy, ticker, self.loggers[ticker], triggered_by_new_bar
+        )
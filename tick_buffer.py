@@ -1,191 +1,460 @@
 import threading
+import numpy as np
 import pandas as pd
 import databento as db
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta, timezone
+from queue import Full
 import pytz
-from utils import configure_logger  # Ensure this is correctly imported from your utils module
+from utils import configure_logger, format_bar_timeframe  # Ensure this is correctly imported from your utils module
+from bar_history import BarRingBuffer
+from config import (globex_close_grace_seconds, globex_max_sleep_seconds, globex_reconnect_lead_seconds,
+                    tick_bar_history_padding, tick_queue_batch_size, tick_queue_capacity, tick_queue_overflow_policy)
+from session_calendar import globex_sessions
+from tick_queue import TickQueue
+
+# DBN prices are fixed-point integers in units of 1e-9
+PRICE_SCALE = 1_000_000_000
+
+
+class TickBar:
+    """Compact OHLCV record for one completed tick bar; timestamp is int ns since epoch."""
+
+    __slots__ = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, timestamp, open, high, low, close, volume):
+        self.timestamp = timestamp
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __getitem__(self, key):
+        # Keeps dict-style access (bar['close']) working for existing callers
+        return getattr(self, key)
+
+    def to_dict(self):
+        return {
+            'timestamp': self.timestamp,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume
+        }
+
+
+class BarAggregator:
+    """
+    Running OHLCV state of the bar being built, updated in place on every tick.
+    Ticks stay raw (int ns timestamps, fixed-point int prices) until to_bar(), which
+    converts once per bar. Subclasses decide when the bar is complete.
+    """
+
+    __slots__ = ('threshold', 'count', 'timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+    bar_type = None
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.timestamp = None
+        self.open = None
+        self.high = None
+        self.low = None
+        self.close = None
+        self.volume = 0
+
+    def update(self, timestamp, price, volume):
+        """Fold one trade into the running bar. Returns True once the bar is complete."""
+        raise NotImplementedError
+
+    def to_bar(self):
+        return TickBar(
+            self.timestamp,
+            self.open / PRICE_SCALE,
+            self.high / PRICE_SCALE,
+            self.low / PRICE_SCALE,
+            self.close / PRICE_SCALE,
+            self.volume
+        )
+
+    def bar_ends(self, prices, sizes):
+        """
+        Indices of the ticks that close each complete bar when the columns are fed from an
+        empty bar. Generic version replays update() on a scratch aggregator; subclasses
+        with a closed form override it.
+        """
+        scratch = self.__class__.__new__(self.__class__)
+        for name in self._config_slots():
+            setattr(scratch, name, getattr(self, name))
+        scratch.reset()
+        ends = []
+        for i, (price, size) in enumerate(zip(prices.tolist(), sizes.tolist())):
+            if scratch.update(None, price, size):
+                ends.append(i)
+                scratch.reset()
+        return np.asarray(ends, dtype=np.int64)
+
+    def _config_slots(self):
+        return ('threshold',)
+
+
+class TickBarAggregator(BarAggregator):
+    """Closes a bar every `threshold` trades."""
+
+    __slots__ = ()
+
+    bar_type = 'tick'
+
+    @property
+    def tick_size(self):
+        return self.threshold
+
+    def update(self, timestamp, price, volume):
+        if self.count == 0:
+            self.open = self.high = self.low = price
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.timestamp = timestamp
+        self.volume += volume
+        self.count += 1
+        return self.count >= self.threshold
+
+    def bar_ends(self, prices, sizes):
+        n_full = (len(prices) // self.threshold) * self.threshold
+        return np.arange(self.threshold - 1, n_full, self.threshold, dtype=np.int64)
+
+
+class VolumeBarAggregator(BarAggregator):
+    """Closes a bar once it holds at least `threshold` contracts; the closing trade is not split."""
+
+    __slots__ = ()
+
+    bar_type = 'volume'
+
+    def update(self, timestamp, price, volume):
+        if self.count == 0:
+            self.open = self.high = self.low = price
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.timestamp = timestamp
+        self.volume += volume
+        self.count += 1
+        return self.volume >= self.threshold
+
+    def bar_ends(self, prices, sizes):
+        # Each bar ends at the first tick whose running total reaches the previous end's total + threshold
+        cumulative = np.cumsum(sizes, dtype=np.int64)
+        ends = []
+        base = 0
+        while True:
+            i = int(np.searchsorted(cumulative, base + self.threshold, side='left'))
+            if i >= len(cumulative):
+                break
+            ends.append(i)
+            base = int(cumulative[i])
+        return np.asarray(ends, dtype=np.int64)
+
+
+class NotionalBarAggregator(BarAggregator):
+    """Closes a bar once traded notional (price * size * contract multiplier) reaches `threshold` dollars."""
+
+    __slots__ = ('multiplier', 'notional')
+
+    bar_type = 'notional'
+
+    def __init__(self, threshold, multiplier=1):
+        self.multiplier = multiplier
+        # Compared against fixed-point notional, so integer math stays exact
+        super().__init__(int(threshold) * PRICE_SCALE)
+
+    def reset(self):
+        super().reset()
+        self.notional = 0
+
+    def update(self, timestamp, price, volume):
+        if self.count == 0:
+            self.open = self.high = self.low = price
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.timestamp = timestamp
+        self.volume += volume
+        self.count += 1
+        self.notional += price * volume * self.multiplier
+        return self.notional >= self.threshold
+
+    def _config_slots(self):
+        return ('threshold', 'multiplier')
+
+
+class RangeBarAggregator(BarAggregator):
+    """Closes a bar once its high - low spans at least `threshold` price points."""
+
+    __slots__ = ()
+
+    bar_type = 'range'
+
+    def __init__(self, threshold):
+        super().__init__(int(round(threshold * PRICE_SCALE)))
+
+    def update(self, timestamp, price, volume):
+        if self.count == 0:
+            self.open = self.high = self.low = price
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.timestamp = timestamp
+        self.volume += volume
+        self.count += 1
+        return self.high - self.low >= self.threshold
+
+
+BAR_AGGREGATORS = {
+    'tick': TickBarAggregator,
+    'volume': VolumeBarAggregator,
+    'notional': NotionalBarAggregator,
+    'range': RangeBarAggregator,
+}
+
+
+def make_bar_aggregator(bar_type, threshold, multiplier=1):
+    """Create the aggregator for a bar type returned by utils.parse_bar_timeframe."""
+    if bar_type == 'notional':
+        return NotionalBarAggregator(threshold, multiplier)
+    return BAR_AGGREGATORS[bar_type](threshold)
+
+
+def build_bars(ts_event, prices, sizes, aggregator):
+    """
+    Build OHLCV bars from sorted raw trade columns (int ns, fixed-point int prices) in one
+    pass: the aggregator finds where each bar closes, then ufunc.reduceat reduces every
+    bar's slice at once.
+    Returns (columns, remainder): a dict of bar column arrays in BarRingBuffer order and
+    the index of the first tick that did not fill a complete bar.
+    """
+    ends = aggregator.bar_ends(prices, sizes)
+    if len(ends) == 0:
+        empty = np.empty(0)
+        return {name: empty for name in BarRingBuffer.COLUMNS}, 0
+
+    n_full = int(ends[-1]) + 1
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    columns = {
+        'timestamp': ts_event[ends].astype(np.int64),
+        'open': prices[starts] / PRICE_SCALE,
+        'high': np.maximum.reduceat(prices[:n_full], starts) / PRICE_SCALE,
+        'low': np.minimum.reduceat(prices[:n_full], starts) / PRICE_SCALE,
+        'close': prices[ends] / PRICE_SCALE,
+        'volume': np.add.reduceat(sizes[:n_full].astype(np.int64), starts),
+    }
+    return columns, n_full
+
+
+def load_historical_trades(db_client, symbol, dataset, start, end, schema='trades', dbn_cache=None, logger=None):
+    """
+    Resolve a symbol's instrument ids and download its trades for [start, end).
+    Returns (instrument_ids, trades) with trades as a raw DBN record array sorted by
+    (ts_event, sequence), or (instrument_ids, None) when nothing was returned.
+    """
+    logger = logger or logging.getLogger('TickDataBuffer')
+    logger.info(f"Fetching historical tick data for warmup: {symbol} [{start} to {end}]")
+    print(f"Fetching historical tick data for warmup: {symbol} [{start} to {end}]")
+    result = db_client.symbology.resolve(
+        dataset=dataset,
+        symbols=[symbol],
+        stype_in="raw_symbol",
+        stype_out="instrument_id",
+        start_date=start,
+        end_date=end,
+    )
+    print(f"Resolved symbol: {result}")
+    instrument_ids = {int(mapping['s']) for mapping in result.get('result', {}).get(symbol, [])}
+    # Raw DBN records: integer ns timestamps and fixed-point prices, same as the live feed
+    if dbn_cache is not None:
+        trades = dbn_cache.get_range(dataset, symbol, start, end, schema=schema)
+    else:
+        data = db_client.timeseries.get_range(
+            dataset=dataset,
+            symbols=[symbol],
+            schema=schema,
+            start=start,
+            end=end
+        )
+        trades = data.to_ndarray()
+    if len(trades) == 0:
+        logger.warning(f"No historical data returned for {symbol}")
+        return instrument_ids, None
+
+    trades = trades[np.lexsort((trades['sequence'], trades['ts_event']))]
+    logger.info(f"Fetched and parsed {len(trades)} ticks for {symbol}")
+    return instrument_ids, trades
+
 
 class TickDataBuffer:
-    def __init__(self, ticker, tick_size, db_api_key=None):
+    def __init__(self, ticker, tick_size, db_api_key=None, max_period=3, db_client=None, dbn_cache=None,
+                 bar_type='tick', multiplier=1, timeframe=None):
         self.ticker = ticker
-        self.tick_size = tick_size
-        self.buffer = []
-        self.processed_bars = []
+        self.tick_size = tick_size  # bar threshold, in the unit of bar_type
+        self.bar_type = bar_type
+        self.timeframe = timeframe or format_bar_timeframe(bar_type, tick_size)  # e.g. "50t"
+        self.max_period = max_period
+        self.aggregator = make_bar_aggregator(bar_type, tick_size, multiplier)
+        # Strategies read at most max_period + 1 bars; keep a little headroom on top
+        self.bar_history = BarRingBuffer(max_period + 1 + tick_bar_history_padding)
         self.lock = threading.Lock()
         # Note: configure_logger needs to be imported from utils
         self.logger = configure_logger(ticker)
         self.new_bar_event = threading.Event()
         self.historical_loaded = False
-        self.live_client = None
-        self.live_session = None
+        self.instrument_ids = set()  # filled from symbology during warmup, used for live routing
+        self.dbn_cache = dbn_cache  # optional DBNCache for warmup downloads
+        # Last tick folded into a bar; live replay resumes here
+        self.last_ts_event = 0
+        self.last_sequence = -1
+        # (ts_event, sequence) of the last tick known before going live; replayed records up
+        # to it are duplicates. Cleared once the feed moves past that nanosecond.
+        self.resume_point = None
+        self.duplicates_skipped = 0
+        # Gateway and local receive times (ns) of the last live tick, carried on the bar it closes
+        self.last_ts_recv = 0
+        self.last_local_ns = 0
 
-        if db_api_key:
+        # Live data is received by DatabentoLiveManager on one shared session per dataset
+        if db_client is not None:
+            self.db_client = db_client
+        elif db_api_key:
             self.db_client = db.Historical(key=db_api_key)
-            self.live_client = db.Live(key=db_api_key)
-            print(f"Live clienttt {self.live_client} initialized with API key.")
         else:
             self.db_client = db.Historical()
-            self.live_client = db.Live()
-
 
     def warmup_with_historical_ticks(self, symbol, dataset, start, end, schema='trades'):
         try:
-            self.logger.info(f"Fetching historical tick data for warmup: {symbol} [{start} to {end}]")
-            print(f"Fetching historical tick data for warmup: {symbol} [{start} to {end}]")
-            # Fetch raw trade ticks
-            result = self.db_client.symbology.resolve(
-                dataset=dataset,
-                symbols=[symbol],
-                stype_in="raw_symbol",
-                stype_out="instrument_id",
-                start_date=start,
-                end_date=end,
-            )
-            print(f"Resolved symbol: {result}")
-            data = self.db_client.timeseries.get_range(
-                dataset=dataset,
-                symbols=[symbol],
-                schema=schema,
-                start=start,
-                end=end
+            instrument_ids, trades = load_historical_trades(
+                self.db_client, symbol, dataset, start, end, schema=schema, dbn_cache=self.dbn_cache,
+                logger=self.logger
             )
+            self.instrument_ids.update(instrument_ids)
+            if trades is not None:
+                self.warmup_from_trades(trades)
+        except Exception as e:
+            self.logger.error(f"Databento historical warmup failed for {symbol}: {e}", exc_info=True)
 
-            print(f"Data fetched for {symbol}: {data}")
-            df = data.to_df()
-            if df.empty:
-                self.logger.warning(f"No historical data returned for {symbol}")
-                return
+    def warmup_from_trades(self, trades):
+        """Build bars from a (ts_event, sequence)-sorted trades record array and resume after its last tick."""
+        ts_event = trades['ts_event']
+        prices = trades['price']
+        sizes = trades['size']
 
-            # Only print the first row if DataFrame is not empty
-            print(df.iloc[0].to_json(indent=4))
-            if df.empty:
-                self.logger.warning(f"No historical data returned for {symbol}")
-                return
+        columns, remainder = build_bars(ts_event, prices, sizes, self.aggregator)
+        self.bar_history.extend(**columns)
+        self._on_warmup_bars()
 
-            df.sort_values("ts_event", inplace=True)
-            df.reset_index(drop=True, inplace=True)
+        # Leave the trailing partial bar in the aggregator so live ticks continue it
+        self.aggregator.reset()
+        for ts, price, size in zip(ts_event[remainder:].tolist(), prices[remainder:].tolist(),
+                                   sizes[remainder:].tolist()):
+            self.aggregator.update(ts, price, size)
 
-            # Normalize price and construct tick dicts
-            df['price'] = df['price'] / 1e9
-            df['timestamp'] = pd.to_datetime(df['ts_event'], unit='ns')
-            df['volume'] = df['size']
+        self.set_resume_point(int(ts_event[-1]), int(trades['sequence'][-1]))
+        self.historical_loaded = True
+        self.logger.info(
+            f"Historical warmup completed for {self.ticker} {self.timeframe}: {self.bar_history.total} bars created."
+        )
 
-            ticks = df[['timestamp', 'price', 'volume']].to_dict(orient='records')
+    def set_resume_point(self, ts_event, sequence):
+        """Record the last tick already aggregated so live replay can resume right after it."""
+        self.last_ts_event = ts_event
+        self.last_sequence = sequence
+        self.resume_point = (ts_event, sequence)
 
-            self.logger.info(f"Fetched and parsed {len(ticks)} ticks for {symbol}")
+    def on_trade_record(self, record, local_ns=0):
+        """Feed one live TradeMsg, dropping records replayed from before the resume point.
+        local_ns is the wall-clock time the record was read off the socket."""
+        ts_event = record.ts_event
+        if self.resume_point is not None:
+            if (ts_event, record.sequence) <= self.resume_point:
+                self.duplicates_skipped += 1
+                return
+            if ts_event > self.resume_point[0]:
+                self.logger.info(
+                    f"Live feed for {self.ticker} caught up; skipped {self.duplicates_skipped} replayed ticks"
+                )
+                self.resume_point = None
+        self.last_ts_event = ts_event
+        self.last_sequence = record.sequence
+        self.last_ts_recv = record.ts_recv
+        self.last_local_ns = local_ns
+        self.add_trade(ts_event, record.price, record.size)
 
-            # Build bars from tick chunks
-            bar_ticks = []
-            for tick in ticks:
-                bar_ticks.append(tick)
-                if len(bar_ticks) >= self.tick_size:
-                    self.buffer = bar_ticks
-                    bar = self._create_bar_from_ticks()
-                    self.processed_bars.append(bar)
-                    bar_ticks = []
+    def add_tick(self, tick_data):
+        """Dict-based entry point (float price, datetime timestamp), kept for utils.on_tick_received."""
+        self.add_trade(
+            pd.Timestamp(tick_data['timestamp']).value,
+            int(round(tick_data['price'] * PRICE_SCALE)),
+            tick_data['volume']
+        )
 
-            self.buffer = []  # clear residuals
-            self.historical_loaded = True
-            self.logger.info(f"Historical warmup completed for {symbol}: {len(self.processed_bars)} bars created.")
+    def add_trade(self, ts_event, price, volume):
+        """Hot path: ts_event in int ns and price in DBN fixed-point; nothing is converted per tick."""
+        with self.lock:
+            if not self.aggregator.update(ts_event, price, volume):
+                return
+            bar = self._create_bar_from_ticks()
+            self.bar_history.append(bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume)
+        # Publishing and logging happen outside the lock so readers of bar_history never wait on I/O
+        self._publish_bar(bar)
+        self.logger.info(
+            f"Created new {self.timeframe} bar for {self.ticker}: "
+            f"open={bar.open}, high={bar.high}, low={bar.low}, close={bar.close}, volume={bar.volume}"
+        )
+        self.new_bar_event.set()
 
-        except Exception as e:
-            self.logger.error(f"Databento historical warmup failed for {symbol}: {e}", exc_info=True)
+    def restore_saved_state(self):
+        """Hook for subclasses that persist bars and a resume point across restarts."""
+        return False
 
-    async def start_live_subscription(self, symbol, dataset, schema='trades', start_time=0):
-        """Start live tick data subscription using Databento Live API with optional replay"""
-        try:
-            self.logger.info(f"Starting live tick subscription for {symbol} on dataset {dataset}")
-            if start_time:
-                self.logger.info(f"Using intraday replay starting from {start_time}")
-            
-            # Create live session
-            self.live_session = self.live_client
-            
-            # Subscribe to the symbol with optional start time for intraday replay
-            self.live_session.subscribe(
-                dataset=dataset,
-                schema=schema,
-                symbols=[symbol],
-                stype_in="raw_symbol",
-                start=0  # This enables intraday replay from specified time
-            )
-            
-            self.logger.info(f"Successfully subscribed to live data for {symbol}")
-            
-            # Start the session to begin receiving data
-            # self.live_session.start()
-            
-            # Start consuming live data
-            async for record in self.live_session:
-                try:
-                    # Only process trade messages (rtype == "Trade" or check type)
-                    if hasattr(record, "price") and hasattr(record, "size"):
-                        tick_data = {
-                            'timestamp': pd.to_datetime(record.ts_event, unit='ns'),
-                            'price': record.price / 1e9,
-                            'volume': record.size,
-                            'symbol': symbol
-                        }
-                        self.add_tick(tick_data)
-                    else:
-                        # Optionally log or skip non-trade messages
-                        self.logger.debug(f"Ignored non-trade message for {symbol}: {record}")
-                except Exception as e:
-                    self.logger.error(f"Error processing live tick for {symbol}: {e}")
-                    
-            self.logger.info(f"Live subscription ended for {symbol}")      
-        except Exception as e:
-            self.logger.error(f"Error in live subscription for {symbol}: {e}", exc_info=True)
-        finally:
-            if self.live_session:
-                await self.live_session.stop()
-
-    def stop_live_subscription(self):
-        """Stop the live subscription"""
-        if self.live_session:
-            try:
-                asyncio.create_task(self.live_session.stop())
-                self.logger.info(f"Live subscription stopped for {self.ticker}")
-            except Exception as e:
-                self.logger.error(f"Error stopping live subscription for {self.ticker}: {e}")
+    def _on_warmup_bars(self):
+        """Hook for subclasses to persist bars built during historical warmup (now in bar_history)."""
+        pass
 
-    def add_tick(self, tick_data):
-        with self.lock:
-            self.buffer.append(tick_data)
-            if len(self.buffer) >= self.tick_size:
-                bar = self._create_bar_from_ticks()
-                self.processed_bars.append(bar)
-                self.logger.info(
-                    f"Created new tick‐bar for {self.ticker}: "
-                    f"open={bar['open']}, high={bar['high']}, low={bar['low']}, close={bar['close']}, volume={bar['volume']}"
-                )
-                self.buffer = []
-                self.new_bar_event.set()
+    def _publish_bar(self, bar):
+        """Hook for subclasses to ship a completed bar; called once per bar, outside the lock."""
+        pass
 
     def _create_bar_from_ticks(self):
-        if not self.buffer:
+        """Close the running bar and reset the aggregator for the next one."""
+        if not self.aggregator.count:
             return None
-        prices = [tick['price'] for tick in self.buffer]
-        volumes = [tick['volume'] for tick in self.buffer]
-        timestamps = [tick['timestamp'] for tick in self.buffer]
-        return {
-            'timestamp': timestamps[-1],
-            'open': prices[0],
-            'high': max(prices),
-            'low': min(prices),
-            'close': prices[-1],
-            'volume': sum(volumes)
-        }
+        bar = self.aggregator.to_bar()
+        self.aggregator.reset()
+        return bar
 
     def get_dataframe(self, min_bars=5):
         with self.lock:
-            if len(self.processed_bars) < min_bars:
+            if len(self.bar_history) < min_bars:
                 return None
-            df = pd.DataFrame(self.processed_bars[-min_bars:])
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df.set_index('timestamp', inplace=True)
+            bars = self.bar_history.last(min_bars)
+            df = pd.DataFrame({name: bars[name] for name in BarRingBuffer.COLUMNS[1:]},
+                              index=pd.to_datetime(bars['timestamp'], unit='ns'))
+            df.index.name = 'timestamp'
             return df
 
     def wait_for_new_bar(self, timeout=None):
@@ -195,50 +464,316 @@ class TickDataBuffer:
         self.new_bar_event.clear()
 
 
+class ContractFeed:
+    """
+    Single ingestion path for one contract. Every live trade is fanned out to each bar
+    buffer built on the contract (one per timeframe), and warmup downloads the trades once
+    for all of them. DatabentoLiveManager routes records to feeds, not to buffers.
+    """
+
+    def __init__(self, ticker, db_client=None, dbn_cache=None):
+        self.ticker = ticker
+        self.db_client = db_client
+        self.dbn_cache = dbn_cache
+        self.buffers = {}  # timeframe -> TickDataBuffer
+        self._fanout = ()
+        self.instrument_ids = set()
+        self.logger = logging.getLogger(f'ContractFeed.{ticker}')
+
+    def add_buffer(self, buffer):
+        self.buffers[buffer.timeframe] = buffer
+        self._fanout = tuple(self.buffers.values())
+        buffer.instrument_ids = self.instrument_ids  # one id set per contract, shared by its buffers
+        return buffer
+
+    def warmup(self, dataset, start, end, schema='trades', buffers=None):
+        """Download the warmup trades once and build bars for each buffer (all of them by default)"""
+        buffers = list(self.buffers.values()) if buffers is None else buffers
+        if not buffers:
+            return
+        try:
+            instrument_ids, trades = load_historical_trades(
+                self.db_client, self.ticker, dataset, start, end, schema=schema, dbn_cache=self.dbn_cache,
+                logger=self.logger
+            )
+            self.instrument_ids.update(instrument_ids)
+        except Exception as e:
+            self.logger.error(f"Databento historical warmup failed for {self.ticker}: {e}", exc_info=True)
+            return
+        if trades is None:
+            return
+        for buffer in buffers:
+            try:
+                buffer.warmup_from_trades(trades)
+            except Exception as e:
+                self.logger.error(f"Warmup failed for {self.ticker} {buffer.timeframe}: {e}", exc_info=True)
+
+    def replay_start(self):
+        """Earliest resume point across the buffers (0 replays the whole session)"""
+        if not self._fanout or any(buffer.resume_point is None for buffer in self._fanout):
+            return 0
+        return min(buffer.resume_point[0] for buffer in self._fanout)
+
+    def on_trade_record(self, record, local_ns=0):
+        for buffer in self._fanout:
+            buffer.on_trade_record(record, local_ns)
+
+
+class _DrainMarker:
+    """Tick queue item the aggregator reaches only after every record queued before it"""
+    ticker = 'drain-marker'
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.done = loop.create_future()
+
+    def on_trade_record(self, record, local_ns=0):
+        self.loop.call_soon_threadsafe(self._set_done)
+
+    def _set_done(self):
+        if not self.done.done():
+            self.done.set_result(None)
+
+
 class DatabentoLiveManager:
-    """Manages live Databento subscriptions for multiple symbols"""
+    """
+    Runs one multiplexed Databento Live session per dataset and routes records by instrument_id.
+
+    Session readers only route and enqueue records; a single aggregator thread drains the
+    bounded tick_queue in batches and does the bar building and publishing, so a slow
+    Redis round trip never stalls the socket read.
+
+    A dataset's session is only kept up while the CME Globex session of at least one of its
+    contracts is open: it is stopped after the daily halt, weekend or holiday close and
+    reconnected shortly before the next open, replaying from where the buffers left off.
+    """
     
-    def __init__(self, db_api_key=None):
+    def __init__(self, db_api_key=None, queue_capacity=tick_queue_capacity, batch_size=tick_queue_batch_size,
+                 overflow_policy=tick_queue_overflow_policy):
         self.db_api_key = db_api_key
         self.live_tasks = {}
+        self.sessions = {}
+        self.routes = {}  # instrument_id -> ContractFeed (or a single TickDataBuffer)
+        self.tick_queue = TickQueue(queue_capacity, overflow_policy)
+        self.batch_size = batch_size
+        self.aggregator_thread = None
         self.logger = logging.getLogger('DatabentoLiveManager')
+
+    def _new_live_client(self):
+        return db.Live(key=self.db_api_key) if self.db_api_key else db.Live()
         
     async def start_live_feeds(self, symbols_config, tick_buffers):
         """
         Start live feeds for multiple symbols
         symbols_config: dict like {'ESM2': {'dataset': 'GLBX.MDP3', 'schema': 'trades', 'start_time': timestamp}}
-        tick_buffers: dict of ticker -> TickDataBuffer instances
+        tick_buffers: dict of ticker -> ContractFeed (or TickDataBuffer) receiving that symbol's trades
         """
-        tasks = []
-        
+        # Group symbols so each dataset gets a single gateway connection
+        groups = {}
+        replay_starts = {}
         for symbol, config in symbols_config.items():
-            if symbol in tick_buffers:
-                dataset = config.get('dataset', 'GLBX.MDP3')
-                schema = config.get('schema', 'trades')
-                start_time = config.get('start_time', 0) # Default to 0 for full replay
-                
-                # Create task for this symbol's live feed
-                task = asyncio.create_task(
-                    tick_buffers[symbol].start_live_subscription(symbol, dataset, schema, start_time)
-                )
-                self.live_tasks[symbol] = task
-                tasks.append(task)
-                
-                self.logger.info(f"Started live feed task for {symbol} with start_time: {start_time}")
+            if symbol not in tick_buffers:
+                continue
+            dataset = config.get('dataset', 'GLBX.MDP3')
+            schema = config.get('schema', 'trades')
+            groups.setdefault(dataset, {}).setdefault(schema, {})[symbol] = tick_buffers[symbol]
+            # The session replays from the earliest resume point; buffers drop what they already have
+            start_time = config.get('start_time', 0)  # 0 replays the whole session
+            replay_starts[dataset] = min(replay_starts.get(dataset, start_time), start_time)
+
+            # Prebuild the routing table from the ids resolved during warmup
+            for instrument_id in tick_buffers[symbol].instrument_ids:
+                self.routes[instrument_id] = tick_buffers[symbol]
+
+        self.aggregator_thread = threading.Thread(target=self._aggregate_loop, name='tick-aggregator', daemon=True)
+        self.aggregator_thread.start()
+
+        tasks = []
+        for dataset, schemas in groups.items():
+            task = asyncio.create_task(self._run_while_open(dataset, schemas, replay_starts[dataset]))
+            self.live_tasks[dataset] = task
+            tasks.append(task)
+            self.logger.info(
+                f"Started live feed task for {dataset} with symbols: {[s for b in schemas.values() for s in b]}, "
+                f"start_time: {replay_starts[dataset]}"
+            )
         
         if tasks:
-            # Run all live feeds concurrently
+            # Run all live sessions concurrently
             await asyncio.gather(*tasks, return_exceptions=True)
-    
-    def stop_all_feeds(self, tick_buffers):
+
+        # Let the aggregator finish what the sessions already queued
+        self.tick_queue.close()
+        await asyncio.to_thread(self.aggregator_thread.join)
+
+    def _aggregate_loop(self):
+        """Drain the tick queue in batches and fold each record into its buffer"""
+        queue = self.tick_queue
+        while True:
+            batch = queue.drain(self.batch_size, timeout=1.0)
+            if not batch:
+                if queue.closed:
+                    break
+                continue
+            for buffer, record, local_ns in batch:
+                try:
+                    buffer.on_trade_record(record, local_ns)
+                except Exception as e:
+                    self.logger.error(f"Error aggregating record for {buffer.ticker}: {e}")
+        self.logger.info(f"Aggregator stopped, queue stats: {queue.stats()}")
+
+    def queue_stats(self):
+        """Depth, high-water mark and drop/overflow counters of the reader -> aggregator queue"""
+        return self.tick_queue.stats()
+
+    async def _run_while_open(self, dataset, schemas, start_time=0):
+        """
+        Keep the dataset's live session up while any of its contracts' Globex sessions is open.
+        Once all are closed (daily halt, weekend, holiday) and the grace period has passed, the
+        session is stopped; it reconnects globex_reconnect_lead_seconds before the next open and
+        replays from the feeds' last aggregated ticks. A session that ends on its own ends this too.
+        """
+        symbols = [symbol for schema_buffers in schemas.values() for symbol in schema_buffers]
+        feeds = [feed for schema_buffers in schemas.values() for feed in schema_buffers.values()]
+        resumed = False
+        while True:
+            delay = self._seconds_until_open(symbols)
+            if delay is None:
+                self.logger.warning(f"No upcoming Globex session known for {dataset}, connecting anyway")
+            elif delay > globex_reconnect_lead_seconds:
+                self.logger.info(f"Globex closed for {dataset}, reconnecting in {delay / 60:.0f} min")
+                await asyncio.sleep(delay - globex_reconnect_lead_seconds)
+                continue
+            if resumed:
+                # Records of the last session may still be queued; resume after all of them
+                await self._drain_tick_queue()
+                start_time = self._resume_start(feeds)
+
+            session = asyncio.create_task(self._run_session(dataset, schemas, start_time))
+            closer = asyncio.create_task(self._stop_after_close(dataset, symbols))
+            try:
+                done, _ = await asyncio.wait({session, closer}, return_when=asyncio.FIRST_COMPLETED)
+                if closer not in done:
+                    return  # the session ended on its own
+                await session
+            finally:
+                closer.cancel()
+                session.cancel()
+            resumed = True
+
+    @staticmethod
+    def _seconds_until_open(symbols):
+        """Seconds until the first of the symbols' Globex sessions opens (0 if one is open, None if unknown)"""
+        now = time.time()
+        delays = [delay for delay in (globex_sessions(symbol).seconds_until_open(now) for symbol in symbols)
+                  if delay is not None]
+        return min(delays) if delays else None
+
+    async def _stop_after_close(self, dataset, symbols):
+        """Stop the dataset's live session once all its symbols' Globex sessions closed and stayed closed for the grace period"""
+        while True:
+            delay = self._seconds_until_open(symbols)
+            if delay is None:
+                await asyncio.sleep(globex_max_sleep_seconds)
+                continue
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+            until_close = max(globex_sessions(symbol).seconds_until_close(time.time()) for symbol in symbols)
+            await asyncio.sleep(until_close + globex_close_grace_seconds)
+            if self._seconds_until_open(symbols):
+                break
+        live = self.sessions.get(dataset)
+        if live is not None:
+            self.logger.info(f"Globex closed for all {dataset} contracts, suspending the live session")
+            try:
+                live.stop()
+            except Exception as e:
+                self.logger.error(f"Error stopping live session for {dataset}: {e}")
+
+    async def _drain_tick_queue(self):
+        """Wait until the aggregator has folded in every record queued so far"""
+        marker = _DrainMarker(asyncio.get_running_loop())
+        if await self.tick_queue.put_async((marker, None, 0)):
+            await marker.done
+
+    @staticmethod
+    def _resume_start(feeds):
+        """Resume every buffer after its last aggregated tick; returns the replay start (0 if a buffer has none)"""
+        starts = []
+        for feed in feeds:
+            for buffer in feed.buffers.values() if isinstance(feed, ContractFeed) else (feed,):
+                if buffer.last_ts_event:
+                    buffer.set_resume_point(buffer.last_ts_event, buffer.last_sequence)
+                starts.append(buffer.last_ts_event)
+        return min(starts, default=0)
+
+    async def _run_session(self, dataset, schemas, start_time=0):
+        """Subscribe every symbol of a dataset on one Live session and dispatch its records"""
+        live = self._new_live_client()
+        self.sessions[dataset] = live
+        routes = self.routes
+        enqueue = self.tick_queue.put
+        enqueue_waiting = self.tick_queue.put_async
+        buffers = {}
+        try:
+            for schema, schema_buffers in schemas.items():
+                live.subscribe(
+                    dataset=dataset,
+                    schema=schema,
+                    symbols=list(schema_buffers),
+                    stype_in="raw_symbol",
+                    start=start_time  # Intraday replay from the resume point (0 = whole session)
+                )
+                buffers.update(schema_buffers)
+            self.logger.info(f"Successfully subscribed to live data for {list(buffers)} on {dataset}")
+
+            async for record in live:
+                local_ns = time.time_ns()
+                try:
+                    if isinstance(record, db.TradeMsg):
+                        buffer = routes.get(record.instrument_id)
+                        if buffer is None:
+                            continue
+                        try:
+                            enqueue((buffer, record, local_ns), block=False)
+                        except Full:
+                            # Backpressure without stalling the loop (publisher, metrics, other sessions)
+                            await enqueue_waiting((buffer, record, local_ns))
+                    elif isinstance(record, db.SymbolMappingMsg):
+                        # The gateway announces instrument_id <-> symbol before any data for it
+                        buffer = buffers.get(record.stype_in_symbol)
+                        if buffer is not None:
+                            routes[record.instrument_id] = buffer
+                            buffer.instrument_ids.add(record.instrument_id)
+                            self.logger.info(f"Routing instrument_id {record.instrument_id} to {buffer.ticker}")
+                    else:
+                        self.logger.debug(f"Ignored non-trade message on {dataset}: {record}")
+                except Exception as e:
+                    self.logger.error(f"Error processing live record on {dataset}: {e}")
+
+            self.logger.info(f"Live session ended for {dataset}")
+        except Exception as e:
+            self.logger.error(f"Error in live session for {dataset}: {e}", exc_info=True)
+        finally:
+            self.sessions.pop(dataset, None)
+            try:
+                live.stop()
+            except Exception as e:
+                self.logger.debug(f"Live session for {dataset} already stopped: {e}")
+
+    def stop_all_feeds(self, tick_buffers=None):
         """Stop all live feeds"""
-        for symbol, task in self.live_tasks.items():
+        for dataset, live in list(self.sessions.items()):
+            try:
+                live.stop()
+                self.logger.info(f"Live session stopped for {dataset}")
+            except Exception as e:
+                self.logger.error(f"Error stopping live session for {dataset}: {e}")
+
+        for dataset, task in self.live_tasks.items():
             if not task.done():
                 task.cancel()
-                self.logger.info(f"Cancelled live feed for {symbol}")
-        
-        # Also stop individual buffer subscriptions
-        for symbol, buffer in tick_buffers.items():
-            buffer.stop_live_subscription()
-
+                self.logger.info(f"Cancelled live feed for {dataset}")
 
+        self.tick_queue.close()
@@ -3,21 +3,34 @@ import json
 import redis
 import pandas as pd
 from datetime import datetime, timedelta, timezone
-from tick_buffer import DatabentoLiveManager, TickDataBuffer
-from utils import extract_tick_count, is_tick_timeframe
+from tick_buffer import ContractFeed, DatabentoLiveManager, TickBar, TickDataBuffer
+from dbn_cache import DBNCache
+from bar_history import BarRingBuffer
+from latency import LatencyRecorder, PRODUCER_STAGES
+from bar_transport import make_bar_transport
+from bar_codec import decode_bar_columns, encode_bar
+from bar_publisher import AsyncBarPublisher
+from functools import partial
+from utils import bar_timeframe_error, bar_timeframe_key, is_tick_timeframe, parse_bar_timeframe
 
 import logging
 import databento as db
 
 from utils import get_active_exchange_symbol
 import os
+import time
+from config import contract_multipliers, latency_report_interval, live_replay_max_age_hours
 from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env
 
 class TickProducer:
     def __init__(self, redis_host='localhost', redis_port=6379, redis_db=0,db_api_key=None):
         self.redis_client = redis.Redis(host=redis_host, port=redis_port, db=redis_db)
-        self.tick_buffers = {}
+        self.redis_params = {'host': redis_host, 'port': redis_port, 'db': redis_db}
+        self.publisher = None  # AsyncBarPublisher, live while the feeds run
+        self.bar_transport = make_bar_transport(self.redis_client)  # pub/sub or Streams, see config.bar_transport
+        self.feeds = {}  # exchange symbol -> ContractFeed, one live ingestion path per contract
+        self.tick_buffers = {}  # (exchange symbol, timeframe) -> TickDataBufferWithRedis
         self.live_manager = None
         self.logger = logging.getLogger('TickProducer')
         self.db_api_key= db_api_key
@@ -27,6 +40,10 @@ class TickProducer:
             self.db_client = db.Historical(key=db_api_key)
         else:
             self.db_client = db.Historical()
+        # Warmup ticks are kept on disk so restarts only download the uncached part of the window
+        self.dbn_cache = DBNCache(self.db_client)
+        # Per-symbol, per-stage feed latency, dumped to logs/latency_producer.json and latency:producer
+        self.latency = LatencyRecorder('producer')
 
     def get_available_schema_end_time(self, dataset: str, schema: str) -> datetime:
         """Get the available end time for a given dataset and schema using Databento metadata API."""
@@ -41,64 +58,86 @@ class TickProducer:
     
     def setup_tick_buffers(self, tickers_config):
         """Setup tick buffers for all tick-based symbols"""
-        max_period = 3  # can be inferred from indicators in config
-
         # Use live metadata to determine safe historical end
         safe_historical_end = self.get_available_schema_end_time("GLBX.MDP3", "trades")
 
-        live_symbols_config = {}
+        # Size each bar series' history from the largest period any strategy on it uses
+        series_max_period = {}
+        for ticker, config in tickers_config.items():
+            error = bar_timeframe_error(config[0])
+            if error:
+                self.logger.error(f"Skipping {ticker}: {error}")
+                continue
+            if not is_tick_timeframe(config[0]):
+                continue
+            ticker_for_data = get_active_exchange_symbol(ticker) if ticker.startswith("/") else ticker
+            series = (ticker_for_data, bar_timeframe_key(config[0]))
+            series_max_period[series] = max(series_max_period.get(series, 0), int(config[3]), int(config[5]))
+
+        dataset = "GLBX.MDP3"
+        historical_end_date = safe_historical_end.isoformat()
+        historical_start_date = (safe_historical_end - timedelta(days=1)).isoformat()  # changing things as per new period based ema
+        needs_warmup = {}  # symbol -> buffers without usable saved state
         for ticker, config in tickers_config.items():
             time_frame = config[0]
-            period1 = config[3]
-            period2 = config[5]
             if not is_tick_timeframe(time_frame):
                 continue
 
-            
             ticker_for_data = get_active_exchange_symbol(ticker) if ticker.startswith("/") else ticker
             print(f"Ticker for data {ticker_for_data}")
-            max_period = max(int(period1), int(period2))
-            historical_end_date = safe_historical_end.isoformat()
-            historical_start_date = (safe_historical_end - timedelta(days=1)).isoformat()  # changing things as per new period based ema
+            timeframe = bar_timeframe_key(time_frame)
+            series = (ticker_for_data, timeframe)
             print(f"Processing ticker: {ticker_for_data} with time frame: {time_frame}")
-            if ticker_for_data not in self.tick_buffers:
-                tick_size = extract_tick_count(time_frame)
-
-                buffer = TickDataBufferWithRedis(
-                    ticker=ticker_for_data,
-                    tick_size=tick_size,
-                    redis_client=self.redis_client,
-                    db_api_key=os.getenv("DATABENTO_API_KEY"),
-                    max_period=max_period
-                )
-                self.tick_buffers[ticker_for_data] = buffer
-
-                print(f"Initialized TickDataBuffer for {ticker_for_data} with tick size {tick_size}")
+            if series in self.tick_buffers:
+                continue  # another strategy already uses this contract and bar size
 
-            dataset = "GLBX.MDP3"
+            feed = self.feeds.get(ticker_for_data)
+            if feed is None:
+                feed = self.feeds[ticker_for_data] = ContractFeed(
+                    ticker_for_data, db_client=self.db_client, dbn_cache=self.dbn_cache
+                )
+            bar_type, tick_size = parse_bar_timeframe(time_frame)
+            buffer = feed.add_buffer(TickDataBufferWithRedis(
+                ticker=ticker_for_data,
+                tick_size=tick_size,
+                redis_client=self.redis_client,
+                db_client=self.db_client,
+                dbn_cache=self.dbn_cache,
+                max_period=series_max_period[series],
+                bar_type=bar_type,
+                multiplier=contract_multipliers.get(ticker.lstrip('/'), 1),
+                latency_recorder=self.latency,
+                timeframe=timeframe,
+                transport=self.bar_transport
+            ))
+            self.tick_buffers[series] = buffer
+            print(f"Initialized TickDataBuffer for {ticker_for_data} with {bar_type} bars of {tick_size}")
 
-            # Warmup with historical data
-            self.tick_buffers[ticker_for_data].warmup_with_historical_ticks(
-                symbol=ticker_for_data,
-                dataset=dataset,
-                start=historical_start_date,
-                end=historical_end_date,
-                schema='trades'
-            )
+            # Resume from the state saved by the previous run when it is still inside the
+            # live replay window; otherwise rebuild bars from historical data
+            if not buffer.restore_saved_state():
+                needs_warmup.setdefault(ticker_for_data, []).append(buffer)
 
-            bars = self.tick_buffers[ticker_for_data].processed_bars
-            if bars:
-                last_ts = pd.Timestamp(bars[-1]['timestamp'])
-                replay_start_time = last_ts.value + 1  # nanoseconds
-            else:
-                replay_start_time = 0
+        live_symbols_config = {}
+        for ticker_for_data, feed in self.feeds.items():
+            # One download per contract, shared by every bar size that needs a warmup
+            if needs_warmup.get(ticker_for_data):
+                feed.warmup(
+                    dataset=dataset,
+                    start=historical_start_date,
+                    end=historical_end_date,
+                    schema='trades',
+                    buffers=needs_warmup[ticker_for_data]
+                )
 
-            print(f"LIVE SYMBOL CONFIG {live_symbols_config}")
+            # Replay from the earliest last-aggregated tick's own nanosecond so trades sharing it
+            # are not lost; each buffer drops the ones it already has by sequence number
             live_symbols_config[ticker_for_data] = {
                 'dataset': dataset,
                 'schema': 'trades',
-                'start_time': replay_start_time  # int nanoseconds
+                'start_time': feed.replay_start()  # int nanoseconds
             }
+            print(f"LIVE SYMBOL CONFIG {live_symbols_config}")
 
         return live_symbols_config
 
@@ -107,7 +146,41 @@ class TickProducer:
         if live_symbols_config:
             self.live_manager = DatabentoLiveManager(db_api_key=os.getenv("DATABENTO_API_KEY"))
             self.logger.info(f"Starting live feeds for: {list(live_symbols_config.keys())}")
-            await self.live_manager.start_live_feeds(live_symbols_config, self.tick_buffers)
+            # Live bars go out on pooled asyncio connections instead of blocking round trips
+            self.publisher = AsyncBarPublisher.connect(**self.redis_params)
+            await self.publisher.start()
+            for buffer in self.tick_buffers.values():
+                buffer.publisher = self.publisher
+            reporter = asyncio.create_task(self.report_metrics())
+            try:
+                await self.live_manager.start_live_feeds(live_symbols_config, self.feeds)
+            finally:
+                reporter.cancel()
+                await self.publisher.close()
+                self.bar_transport.close()
+                for buffer in self.tick_buffers.values():
+                    buffer.publisher = None
+                self.report_queue_stats()
+                self.latency.report(self.redis_client)
+
+    async def report_metrics(self):
+        """Periodically dump latency histograms and feed queue counters so they can be read while the feed runs"""
+        while True:
+            await asyncio.sleep(latency_report_interval)
+            # The reports use the synchronous client; keep them off the event loop
+            await asyncio.to_thread(self.report_queue_stats)
+            await asyncio.to_thread(self.latency.report, self.redis_client)
+
+    def report_queue_stats(self):
+        """Log the reader -> aggregator queue counters and store them in the feed_queue:producer hash"""
+        try:
+            stats = self.live_manager.queue_stats()
+            if self.publisher is not None:
+                stats.update({f"publisher_{name}": value for name, value in self.publisher.stats().items()})
+            self.logger.info(f"Feed queue: {stats}")
+            self.redis_client.hset("feed_queue:producer", mapping=stats)
+        except Exception as e:
+            self.logger.error(f"Failed to report feed queue stats: {e}")
 
     def run(self, tickers_config):
         """Main run method"""
@@ -119,44 +192,150 @@ class TickProducer:
 class TickDataBufferWithRedis(TickDataBuffer):
     """Extended TickDataBuffer that publishes bars to Redis"""
 
-    def __init__(self, ticker, tick_size, redis_client, db_api_key=None,max_period=3):
-        super().__init__(ticker, tick_size, db_api_key)
+    def __init__(self, ticker, tick_size, redis_client, db_api_key=None,max_period=3, db_client=None, dbn_cache=None,
+                 bar_type='tick', multiplier=1, latency_recorder=None, timeframe=None, transport=None):
+        super().__init__(ticker, tick_size, db_api_key, max_period=max_period, db_client=db_client,
+                         dbn_cache=dbn_cache, bar_type=bar_type, multiplier=multiplier, timeframe=timeframe)
         self.redis_client = redis_client
-        self.max_period = max_period
-
-    def _create_bar_from_ticks(self):
-        if not self.buffer:
-            return None
-
-        bar = super()._create_bar_from_ticks()
-
-        if bar:
-            bar_data = {
-                'symbol': self.ticker,
-                'timestamp': bar['timestamp'].isoformat(),
-                'open': bar['open'],
-                'high': bar['high'],
-                'low': bar['low'],
-                'close': bar['close'],
-                'volume': bar['volume']
-            }
+        self.latency = latency_recorder
+        self.transport = transport or make_bar_transport(redis_client)
+        # Set by TickProducer while live; without it bars are published synchronously (warmup, replays)
+        self.publisher = None
+        # Sequence number of the last bar of this series; the ZSET score and the consumer's gap check
+        self.bar_seq = 0
+        # Redis keys are per contract and bar size: tick_bars:ESZ5:50t, bars_history:ESZ5:50t, ...
+        self.series = f"{self.ticker}:{self.timeframe}"
+
+    def _bar_payload(self, bar, seq):
+        return {
+            'symbol': self.ticker,
+            'timeframe': self.timeframe,
+            'seq': seq,
+            'timestamp': bar.timestamp,  # close time, int ns
+            'open': bar.open,
+            'high': bar.high,
+            'low': bar.low,
+            'close': bar.close,
+            'volume': bar.volume
+        }
+
+    def _resume_key(self):
+        return f"resume_point:{self.series}"
 
-            # ---- Publish to Redis Pub/Sub channel ----
-            channel = f"tick_bars:{self.ticker}"
-            self.redis_client.publish(channel, json.dumps(bar_data))
+    def _bar_spec(self):
+        return f"{self.bar_type}:{self.tick_size}"
 
-            # ---- Store in Redis ZSET for count-based access ----
-            zset_key = f"bars_history:{self.ticker}"
-            timestamp_score = int(pd.Timestamp(bar['timestamp']).timestamp())  # seconds since epoch
-            self.redis_client.zadd(zset_key, {json.dumps(bar_data): timestamp_score})
+    def restore_saved_state(self):
+        """
+        Rebuild bar history from the ZSET and resume from the last persisted bar-close tick.
+        Returns False when there is no usable state (missing, too old for live replay,
+        different bar spec or too few bars), in which case a historical warmup is needed.
+        """
+        try:
+            state = self.redis_client.hgetall(self._resume_key())
+            if not state:
+                return False
+            ts_event = int(state[b'ts_event'])
+            sequence = int(state[b'sequence'])
+            if state.get(b'bar_spec', b'').decode('utf-8') != self._bar_spec():
+                self.logger.info(f"Saved state for {self.ticker} uses another bar type or size, ignoring it")
+                return False
+            if time.time_ns() - ts_event > live_replay_max_age_hours * 3600 * 1_000_000_000:
+                self.logger.info(f"Saved state for {self.ticker} is older than the live replay window")
+                return False
+
+            members = self.redis_client.zrange(f"bars_history:{self.series}", 0, -1)
+            if len(members) < self.max_period + 1:
+                return False
+            columns = decode_bar_columns(members)
+            if not all(columns.pop('seq')):
+                self.logger.info(f"Saved bars for {self.series} predate bar sequence numbers, ignoring them")
+                return False
+            with self.lock:
+                self.bar_history.clear()
+                self.bar_history.extend(**columns)
+                self.aggregator.reset()
+                self.set_resume_point(ts_event, sequence)
+                self.bar_seq = int(state.get(b'bar_seq', 0))
+            self.historical_loaded = True
+            self.logger.info(f"Restored {len(members)} bars for {self.series}, resuming live feed at {ts_event}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to restore saved state for {self.ticker}: {e}", exc_info=True)
+            return False
+
+    def _on_warmup_bars(self):
+        """Seed the history ZSET with the tail of the warmup bars; nothing is published on pub/sub."""
+        tail = self.bar_history.last(self.max_period + 1)
+        if not len(tail['timestamp']):
+            return
+        zset_key = f"bars_history:{self.series}"
+        # Keep numbering after the last bar a previous run published, so consumers never see seq go back
+        self.bar_seq = int(self.redis_client.hget(self._resume_key(), 'bar_seq') or 0)
+        members = {}
+        for row in zip(*(tail[name].tolist() for name in BarRingBuffer.COLUMNS)):
+            bar = TickBar(*row)
+            self.bar_seq += 1
+            members[encode_bar(self._bar_payload(bar, self.bar_seq))] = self.bar_seq
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.delete(zset_key)  # the warmup rebuilds the whole history
+        pipe.zadd(zset_key, members)
+        # A resume point from an earlier run no longer matches this history; the next live bar writes a new one
+        pipe.delete(self._resume_key())
+        pipe.hset(self._resume_key(), 'bar_seq', self.bar_seq)
+        pipe.execute()
+        self.logger.info(f"ZSET seeded for {self.series} with {len(members)} warmup bars")
+
+    def _publish_bar(self, bar):
+        ts_close = time.time_ns()
+        self.bar_seq += 1
+        bar_data = self._bar_payload(bar, self.bar_seq)
+        # Pipeline timestamps (int ns) of the bar's closing tick, for latency measurement
+        bar_data['ts_event'] = bar.timestamp
+        bar_data['ts_recv'] = self.last_ts_recv
+        bar_data['ts_local'] = self.last_local_ns
+        bar_data['ts_close'] = ts_close
+        bar_data['ts_publish'] = time.time_ns()
+        message = encode_bar(bar_data)  # serialized once for both the channel and the ZSET
+        # Resume point values are captured now; the aggregator moves on before an async publish runs
+        queue_commands = partial(self._queue_bar_commands, message, self.bar_seq,
+                                 self.last_ts_event, self.last_sequence)
+
+        if not self.transport.in_pipeline:
+            # Same-host ring: deliver now rather than after this series' queued Redis writes
+            self.transport.publish(None, self.series, message)
+        if self.publisher is not None:
+            self.publisher.submit(self.series, queue_commands, self._on_published, bar_data)
+        else:
+            pipe = self.redis_client.pipeline(transaction=True)
+            queue_commands(pipe)
+            pipe.execute()
+            self._on_published(bar_data, time.time_ns())
 
-            # ---- Trim ZSET to only keep the latest max_period items ----
-            # Remove all but the latest max_period items (highest scores)
-            self.redis_client.zremrangebyrank(zset_key, 0, -(self.max_period + 2))
+        self.logger.info(f"ZSET updated for {self.series} with bar {self.bar_seq} closing at {bar.timestamp}")
 
-            self.logger.info(f"ZSET updated for {self.ticker} with timestamp {timestamp_score}")
+    def _queue_bar_commands(self, message, seq, ts_event, sequence, pipe):
+        """Queue one bar's writes on a MULTI/EXEC pipeline (sync or asyncio), so the ZSET holds the
+        bar by the time pub/sub or Streams subscribers get the message"""
+        zset_key = f"bars_history:{self.series}"
+        # ---- Store in Redis ZSET scored by bar seq, trimmed to the latest max_period + 1 bars ----
+        pipe.zadd(zset_key, {message: seq})
+        pipe.zremrangebyrank(zset_key, 0, -(self.max_period + 2))
+        # ---- Persist the resume point: the closing tick of this bar ----
+        pipe.hset(self._resume_key(), mapping={
+            'ts_event': ts_event,
+            'sequence': sequence,
+            'bar_seq': seq,
+            'bar_spec': self._bar_spec()
+        })
+        # ---- Deliver to the strategy consumer (pub/sub channel or stream) ----
+        if self.transport.in_pipeline:
+            self.transport.publish(pipe, self.series, message)
 
-        return bar
+    def _on_published(self, bar_data, published):
+        if self.latency is not None:
+            self.latency.record_stages(self.series, bar_data, PRODUCER_STAGES)
+            self.latency.record(self.series, 'redis_publish', published - bar_data['ts_publish'])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from collections import deque
+from queue import Full
+
+
+class TickQueue:
+    """
+    Bounded hand-off between the live socket reader and the aggregator thread.
+
+    The reader only put()s; the aggregator drain()s up to batch_size items per wakeup.
+    When full, policy 'block' makes the reader wait for the aggregator (no tick is lost,
+    the gateway buffers upstream) and 'drop' discards the oldest queued item. A reader on
+    an event loop uses put_async(), which waits for room in an executor thread so the
+    loop's other tasks keep running.
+    """
+
+    POLICIES = ('block', 'drop')
+
+    def __init__(self, capacity, policy='block'):
+        if capacity < 1:
+            raise ValueError("TickQueue capacity must be at least 1")
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {self.POLICIES}")
+        self.capacity = capacity
+        self.policy = policy
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.closed = False
+        # Counters, read through stats()
+        self.enqueued = 0
+        self.dropped = 0
+        self.overflows = 0  # puts that found the queue full
+        self.high_water = 0
+        self.batches = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item, block=True):
+        """Enqueue item; with block=False a full 'block' queue raises queue.Full instead of waiting."""
+        with self._cond:
+            if len(self._items) >= self.capacity:
+                if not block and self.policy == 'block' and not self.closed:
+                    raise Full
+                self.overflows += 1
+                if self.policy == 'drop':
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._items) >= self.capacity and not self.closed:
+                        self._cond.wait()
+            if self.closed:
+                self.dropped += 1
+                return False
+            self._items.append(item)
+            self.enqueued += 1
+            if len(self._items) > self.high_water:
+                self.high_water = len(self._items)
+            self._cond.notify_all()
+            return True
+
+    async def put_async(self, item):
+        """put() for a reader on an event loop: a full 'block' queue is waited on off the loop thread"""
+        try:
+            return self.put(item, block=False)
+        except Full:
+            return await asyncio.get_running_loop().run_in_executor(None, self.put, item)
+
+    def drain(self, max_items, timeout=None):
+        """Wait up to timeout for items, then return at most max_items of them (oldest first)."""
+        with self._cond:
+            if not self._items and not self.closed:
+                self._cond.wait(timeout)
+            items = self._items
+            batch = [items.popleft() for _ in range(min(max_items, len(items)))]
+            if batch:
+                self.batches += 1
+                self._cond.notify_all()  # wake a reader blocked on a full queue
+            return batch
+
+    def close(self):
+        """Stop accepting items and wake everyone; queued items can still be drained."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'depth': len(self._items),
+                'capacity': self.capacity,
+                'high_water': self.high_water,
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'overflows': self.overflows,
+                'batches': self.batches,
+            }
@@ -506,16 +506,20 @@ with tab1:
             new_ticker = st.text_input("Ticker Symbol", placeholder="e.g., AAPL or /ES")
             
             time_frame_input = st.text_input(
-                "Time Frame (e.g. 1Min, 5Min, 1Hour, 1Day, 516t, 1600t)",
-                placeholder="Examples: 1Min, 5Min, 15Min, 30Min, 1Hour, 4Hour, 1Day, 516t, 1160t, 1600t"
+                "Time Frame (e.g. 1Min, 5Min, 1Hour, 1Day, 516t, 500v, 5000000n, 2.5r)",
+                placeholder="Examples: 1Min, 5Min, 15Min, 30Min, 1Hour, 4Hour, 1Day, 516t, 1160t, 500v, 5000000n, 2.5r"
             )
 
             # Validate and simplify timeframe
-            valid_suffixes = ["Min", "Hour", "Day", "t"]
+            # t = tick, v = volume, n = notional ($), r = price range bars
+            valid_suffixes = ["Min", "Hour", "Day", "t", "v", "n", "r"]
             simplified_time_frame = None
             invalid_timeframe = False
+            timeframe_error = bar_timeframe_error(time_frame_input) if time_frame_input else None
 
-            if time_frame_input:
+            if timeframe_error:
+                invalid_timeframe = True
+            elif time_frame_input:
                 if any(time_frame_input.endswith(suffix) for suffix in valid_suffixes):
                     if time_frame_input.endswith("Min"):
                         simplified_time_frame = time_frame_input.replace("Min", "")
@@ -523,15 +527,17 @@ with tab1:
                         simplified_time_frame = time_frame_input.replace("Hour", "h")
                     elif time_frame_input.endswith("Day"):
                         simplified_time_frame = time_frame_input.replace("Day", "d")
-                    elif time_frame_input.endswith("t"):
+                    elif is_tick_timeframe(time_frame_input):
                         simplified_time_frame = time_frame_input
                     else:
                         invalid_timeframe = True
                 else:
                     invalid_timeframe = True
 
-            if invalid_timeframe:
-                st.error("❌ Invalid timeframe format. Use formats like 1Min, 5Min, 1Hour, 1Day, or 516t.")
+            if timeframe_error:
+                st.error(f"❌ Invalid timeframe: {timeframe_error}.")
+            elif invalid_timeframe:
+                st.error("❌ Invalid timeframe format. Use formats like 1Min, 5Min, 1Hour, 1Day, 516t, 500v, 5000000n or 2.5r.")
 
             schwab_qty = st.number_input("Schwab Quantity", min_value=0, value=0)
 
@@ -580,8 +586,8 @@ with tab1:
         for ticker, params in st.session_state.tickers_data.items():
             # Expand simplified time frame to display format
             time_frame = params[0]
-            if time_frame.endswith('t'):
-                display_time_frame = time_frame
+            if is_tick_timeframe(time_frame) or bar_timeframe_error(time_frame):
+                display_time_frame = time_frame  # shown as saved, so an invalid bar size can be corrected
             elif time_frame.endswith('h'):
                 display_time_frame = time_frame.replace('h', 'Hour')
             elif time_frame.endswith('d'):
@@ -615,7 +621,7 @@ with tab1:
                 "Ticker": st.column_config.TextColumn("Ticker", width="small"),
                 "Time Frame": st.column_config.TextColumn(
                     "Time Frame",
-                    help="Examples: 1Min, 5Min, 15Min, 1Hour, 1Day, 516t",
+                    help="Examples: 1Min, 5Min, 15Min, 1Hour, 1Day, 516t (ticks), 500v (volume), 5000000n (notional $), 2.5r (range)",
                 ),
                 "Trade": st.column_config.SelectboxColumn(
                     "Trade",
@@ -639,14 +645,17 @@ with tab1:
                     ticker = row["Ticker"]
                     time_frame = row["Time Frame"]
                     simplified_time_frame = None
+                    timeframe_error = bar_timeframe_error(time_frame)
 
-                    if time_frame.endswith("Min"):
+                    if timeframe_error:
+                        errors.append(f"Row {idx+1} ({ticker}): Invalid Time Frame '{time_frame}': {timeframe_error}")
+                    elif time_frame.endswith("Min"):
                         simplified_time_frame = time_frame.replace("Min", "")
                     elif time_frame.endswith("Hour"):
                         simplified_time_frame = time_frame.replace("Hour", "h")
                     elif time_frame.endswith("Day"):
                         simplified_time_frame = time_frame.replace("Day", "d")
-                    elif time_frame.endswith("t"):
+                    elif is_tick_timeframe(time_frame):
                         simplified_time_frame = time_frame
                     else:
                         errors.append(f"Row {idx+1} ({ticker}): Invalid Time Frame '{time_frame}'")
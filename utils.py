@@ -2,13 +2,14 @@ from config import *
 import json
 from pytz import timezone
 import pandas as pd
-import pandas_market_calendars as mcal
 from time import sleep
 from datetime import datetime, time, timedelta
 import logging
 import numpy as np
 import os
 import pytz
+from param_store import strategy_param_store
+from session_calendar import session_calendar
 
 # Function to check if a given day is a weekend
 def is_weekend(date):
@@ -17,32 +18,12 @@ def is_weekend(date):
 
 # Function to check if the market is closed due to a holiday
 def is_holiday(date):
-    nyse = mcal.get_calendar("NYSE")
-
-    holidays = nyse.holidays().holidays
-    holidays = pd.DatetimeIndex(holidays)
-
-    final_holidays = [date.date() for date in holidays.to_pydatetime()]
-
-    if date in final_holidays:
-        return True
-    return False
+    return session_calendar(date).is_holiday(date)
 
 
 # Function to get the market hours for a specific date
 def get_market_hours(date):
-    if is_weekend(date):
-        return None, "Market closed on weekends"
-
-    if is_holiday(date):
-        return None, "Market closed due to holiday"
-
-    nyse = mcal.get_calendar("NYSE")
-    market_date_time = nyse.schedule(date, date, tz=timezone(time_zone))
-    start_time = market_date_time.iloc[0]["market_open"].time()
-    end_time = (market_date_time.iloc[0]["market_close"] - timedelta(minutes=1)).time()
-
-    return (start_time, end_time), "Regular trading day"
+    return session_calendar(date).market_hours(date)
 
 
 def get_current_datetime():
@@ -53,17 +34,9 @@ def get_current_datetime():
 
 
 def is_within_time_range():
+    """Between Sunday 6:00 PM and Friday 5:00 PM (time_zone) of the current week"""
     current_datetime = datetime.now(tz=timezone(time_zone))
-    # Find most recent Sunday 6:00 PM
-    days_since_sunday = (current_datetime.weekday() + 1) % 7
-    last_sunday = current_datetime - timedelta(days=days_since_sunday)
-    start_time = last_sunday.replace(hour=18, minute=0, second=0, microsecond=0)
-    if current_datetime < start_time:
-        # If before this week's Sunday 6pm, go to previous Sunday
-        start_time -= timedelta(days=7)
-    end_time = start_time + timedelta(days=4, hours=23)  # Friday 5:00 PM
-
-    return start_time <= current_datetime <= end_time
+    return session_calendar(current_datetime.date()).in_trading_week(current_datetime)
 
 
 
@@ -119,18 +92,20 @@ def params_parser(params: dict):
     return params
 
 
-def sleep_until_next_interval(ticker, interval_minutes):
+def next_interval_time(ticker, interval_minutes, now=None):
     """
-    Sleeps until the next specified interval in minutes or hours.
+    Returns the start of the next specified interval in minutes or hours after now
+    (default: the current time in time_zone).
 
     Parameters:
     - interval_minutes: int or str
-        The interval to sleep for:
+        The interval:
         - Acceptable intervals: 1, 2, 5, 15, 30 (in minutes)
         - '1h', '4h' (in hours)
         - '1d' for daily
     """
-    now = datetime.now(tz=timezone(time_zone))
+    if now is None:
+        now = datetime.now(tz=timezone(time_zone))
     if interval_minutes.isdigit():
         interval_minutes = int(interval_minutes)
     if "/" == ticker[0]:
@@ -173,18 +148,15 @@ def sleep_until_next_interval(ticker, interval_minutes):
             if minutes >= 60:
                 next_interval = next_interval + timedelta(hours=1)
     else:
+        # Last minute of today's session (15:59, earlier on half days) from the session calendar
+        market_hours, _ = session_calendar(now.date()).market_hours(now.date())
+        last_minute = market_hours[1].strftime("%H:%M") if market_hours else "15:59"
         if isinstance(interval_minutes, str):
             # Handle special cases for hours and daily
             if interval_minutes == "1h":
                 hourly_interval = [
-                    "10:30",
-                    "11:30",
-                    "12:30",
-                    "13:30",
-                    "14:30",
-                    "15:30",
-                    "15:59",
-                ]
+                    i for i in ["10:30", "11:30", "12:30", "13:30", "14:30", "15:30"] if i < last_minute
+                ] + [last_minute]
                 # sleep until next hour and minute from the list above
                 for i in hourly_interval:
                     if now.time() < time.fromisoformat(i):
@@ -198,7 +170,7 @@ def sleep_until_next_interval(ticker, interval_minutes):
 
             elif interval_minutes == "4h":
                 # Calculate the next 4-hour block
-                four_hour_intervals = ["13:30", "15:59"]
+                four_hour_intervals = [i for i in ["13:30"] if i < last_minute] + [last_minute]
                 for i in four_hour_intervals:
                     if now.time() < time.fromisoformat(i):
                         next_interval = now.replace(
@@ -211,7 +183,12 @@ def sleep_until_next_interval(ticker, interval_minutes):
 
             elif interval_minutes == "1d":
                 # Sleep until the start of the next day
-                next_interval = now.replace(hour=15, minute=59, second=0, microsecond=0)
+                next_interval = now.replace(
+                    hour=int(last_minute.split(":")[0]),
+                    minute=int(last_minute.split(":")[1]),
+                    second=0,
+                    microsecond=0,
+                )
             else:
                 raise ValueError("Invalid interval string. Use '1h', '4h', or '1d'.")
         else:
@@ -227,23 +204,28 @@ def sleep_until_next_interval(ticker, interval_minutes):
             if minutes >= 60:
                 next_interval = next_interval + timedelta(hours=1)
 
+    return next_interval
+
+
+def sleep_until_next_interval(ticker, interval_minutes):
+    """Sleeps until the next specified interval in minutes or hours (see next_interval_time)."""
+    now = datetime.now(tz=timezone(time_zone))
     # Calculate the difference in seconds
-    seconds_until_next_interval = (next_interval - now).total_seconds()
+    seconds_until_next_interval = (next_interval_time(ticker, interval_minutes, now) - now).total_seconds()
 
     sleep(seconds_until_next_interval)
 
 
 def get_strategy_prarams(ticker, logger):
-    try:
-        with open(tickers_path, "r") as file:
-            strategy_params = json.load(file)
-
-        return strategy_params[ticker]
-    except Exception as e:
-        logger.error(f"Error in getting strategy params: {str(e)}")
+    """The ticker's StrategyParams from the in-memory store (see param_store.py), waiting until it has them"""
+    store = strategy_param_store()
+    while True:
+        strategy_params = store.get(ticker)
+        if strategy_params is not None:
+            return strategy_params
+        logger.error(f"Error in getting strategy params: no valid params for {ticker} in {tickers_path}")
         sleep(10)
-        strategy_params = get_strategy_prarams(ticker, logger)
-        return strategy_params
+        store.reload()
 
 
 def configure_logger(ticker):
@@ -275,15 +257,75 @@ def store_logs(ticker):
         file.write("")
 
 # Utility functions for tick data
+# Suffixes of event-driven bar timeframes built by the tick producer:
+#   50t -> every 50 trades, 500v -> every 500 contracts,
+#   5000000n -> every $5M notional, 2.5r -> every 2.5 points of high-low range
+BAR_TIMEFRAME_SUFFIXES = {
+    't': 'tick',
+    'v': 'volume',
+    'n': 'notional',
+    'r': 'range',
+}
+
+
+def parse_bar_timeframe(timeframe):
+    """
+    Split an event-driven bar timeframe into (bar_type, threshold), or None for time-based frames.
+    Tick, volume and notional thresholds must be whole numbers ('2.5t' raises ValueError); only
+    range bars take a fractional size.
+    """
+    if not isinstance(timeframe, str) or len(timeframe) < 2:
+        return None
+    bar_type = BAR_TIMEFRAME_SUFFIXES.get(timeframe[-1].lower())
+    if bar_type is None:
+        return None
+    try:
+        threshold = float(timeframe[:-1])
+    except ValueError:
+        return None
+    if threshold <= 0:
+        return None
+    if bar_type != 'range':
+        if not threshold.is_integer():
+            raise ValueError(f"{bar_type} bar threshold must be a whole number, got '{timeframe}'")
+        threshold = int(threshold)
+    return bar_type, threshold
+
+
+def format_bar_timeframe(bar_type, threshold):
+    """Canonical timeframe string for a bar type and threshold, e.g. ('tick', 50) -> '50t'."""
+    suffix = next(key for key, value in BAR_TIMEFRAME_SUFFIXES.items() if value == bar_type)
+    size = str(threshold) if isinstance(threshold, int) else f"{threshold:g}"
+    return f"{size}{suffix}"
+
+
+def bar_timeframe_key(timeframe):
+    """Normalize an event-driven timeframe ('50T', '050t') to the form used in Redis keys ('50t')."""
+    return format_bar_timeframe(*parse_bar_timeframe(timeframe))
+
+
 def is_tick_timeframe(timeframe):
-    """Check if timeframe is tick-based (ends with 't')."""
-    return isinstance(timeframe, str) and timeframe.lower().endswith('t')
+    """Check if timeframe is built from the tick stream (tick, volume, notional or range bars)."""
+    try:
+        return parse_bar_timeframe(timeframe) is not None
+    except ValueError:
+        return False  # a bar suffix with an invalid threshold, see bar_timeframe_error
+
+
+def bar_timeframe_error(timeframe):
+    """Why timeframe is not a valid event-driven bar timeframe (e.g. '2.5t'), or None if it is valid or time-based."""
+    try:
+        parse_bar_timeframe(timeframe)
+    except ValueError as e:
+        return str(e)
+    return None
 
 
 def extract_tick_count(timeframe):
     """Extract number of ticks from timeframe string."""
-    if is_tick_timeframe(timeframe):
-        return int(timeframe[:-1])
+    parsed = parse_bar_timeframe(timeframe)
+    if parsed and parsed[0] == 'tick':
+        return parsed[1]
     return None
 
 